@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+Animated replay of a nested sampling run: live points, MultiNest bounding
+ellipse and expanded ellipse, iteration by iteration.
+
+The run is either a toy MultiNest-like run on the two dimensional Gaussian of
+figure_multinest, or a PolyChord run read from its dead-birth file (the live
+points at each iteration are the ones born below and dying above the current
+likelihood contour).
+
+Frames are drawn by blitting only the artists that change on top of a cached
+background and are streamed to ffmpeg (video output) or to PNG files, so
+memory does not grow with the number of frames.
+
+Usage:
+    python animate_multinest.py [options] output.mp4
+    python animate_multinest.py [options] frames/frame_%05d.png
+"""
+
+# ******************************************************************************
+
+import os
+import numpy as np
+
+import plot_utilities as pu
+
+# ******************************************************************************
+# sources of live points:
+
+def bounding_ellipse( live_points, enlargement=1.2 ):
+    """
+    This function returns the MultiNest bounding ellipse of a set of live
+    points: the covariance ellipse scaled to enclose all of them, and its
+    expanded version (enlargement times the covariance).
+
+    :param live_points: (N,2) array of live points.
+    :param enlargement: covariance enlargement factor.
+    :type enlargement: :class:`float`
+
+    :return: tuple with the center, the covariance of the bounding ellipse
+        and the covariance of the expanded ellipse (all at one sigma).
+    """
+    _mean, _cov = pu.weighted_mean_covariance(live_points)
+    _delta = live_points-_mean
+    _d2 = np.einsum('ni,ij,nj->n', _delta, np.linalg.inv(_cov), _delta)
+    _bound = _cov*np.max(_d2)
+    return _mean, _bound, enlargement*_bound
+
+# ------------------------------------------------------------------------------
+
+def toy_run( num_live=100, num_iterations=1000, enlargement=1.2, prior_width=5., seed=2 ):
+    """
+    Generator replaying a toy MultiNest-like run on a two dimensional standard
+    Gaussian likelihood with a uniform prior. At every iteration the worst
+    live point is replaced by a point drawn uniformly in the expanded
+    bounding ellipse, with higher likelihood.
+
+    :return: yields the iteration number and the (num_live,2) live points.
+    """
+    _rng = np.random.RandomState(seed)
+    _live = _rng.uniform(-prior_width, prior_width, size=(num_live, 2))
+    _logl = -0.5*np.sum(_live**2, axis=1)
+    for _it in range(num_iterations):
+        yield _it, _live
+        _worst = np.argmin(_logl)
+        _mean, _, _expanded = bounding_ellipse(_live, enlargement)
+        _chol = np.linalg.cholesky(_expanded)
+        while True:
+            # uniform point in the unit disk, mapped to the ellipse:
+            _u = _rng.normal(size=2)
+            _u *= np.sqrt(_rng.uniform())/np.linalg.norm(_u)
+            _new = _mean+np.dot(_chol, _u)
+            _new_logl = -0.5*np.sum(_new**2)
+            if np.all(np.abs(_new) <= prior_width) and _new_logl > _logl[_worst]:
+                break
+        _live[_worst] = _new
+        _logl[_worst] = _new_logl
+
+# ------------------------------------------------------------------------------
+
+def dead_birth_run( dead_birth_file, params=(0, 1), every=1 ):
+    """
+    Generator replaying a PolyChord run from its dead-birth file, whose last
+    two columns are the log-likelihood of each point and the log-likelihood
+    contour it was born at. Columns are memory mapped, see chain_utilities.
+
+    The points are sorted once by death and by birth contour, and the live
+    set is updated between iterations: each point joins it once and leaves
+    it once, so that a replay costs O(N log N) for N points, whatever every.
+
+    :param dead_birth_file: path of the root_dead-birth.txt file.
+    :type dead_birth_file: :class:`string`
+    :param params: columns of the two parameters to show.
+    :type params: :class:`tuple`
+    :param every: show one iteration every this many.
+    :type every: :class:`int`
+
+    :return: yields the iteration number and the live points (in no
+        particular order).
+    """
+    import chain_utilities as chu
+    _x, _y, _logl, _birth = chu.load_columns(dead_birth_file, [params[0], params[1], -2, -1])
+    _order = np.argsort(_logl, kind='stable')
+    _points = np.stack([np.asarray(_x)[_order], np.asarray(_y)[_order]], axis=1)
+    _logl = np.asarray(_logl)[_order]
+    _birth = np.asarray(_birth)[_order]
+    # points in the order they are born, i.e. of increasing birth contour:
+    _born = np.argsort(_birth, kind='stable')
+    _num_born = 0
+    # live set: indexes of the live points in the first _num_live slots, and
+    # slot of each point (-1 if not live), for constant time removals:
+    _slots = np.empty(len(_logl), dtype=np.intp)
+    _slot_of = np.full(len(_logl), -1, dtype=np.intp)
+    _num_live = 0
+    for _it in range(len(_logl)):
+        # the point that died at the previous iteration leaves:
+        if _it > 0 and _slot_of[_it-1] >= 0:
+            _last = _slots[_num_live-1]
+            _slots[_slot_of[_it-1]] = _last
+            _slot_of[_last] = _slot_of[_it-1]
+            _slot_of[_it-1] = -1
+            _num_live -= 1
+        # the points born below the current contour, and not dead yet, join:
+        while _num_born < len(_born) and _birth[_born[_num_born]] < _logl[_it]:
+            _new = _born[_num_born]
+            if _new >= _it:
+                _slots[_num_live] = _new
+                _slot_of[_new] = _num_live
+                _num_live += 1
+            _num_born += 1
+        if _it % every == 0 and _num_live > 2:
+            yield _it, _points[_slots[:_num_live]]
+
+# ******************************************************************************
+# frame output:
+
+class frame_writer:
+    """
+    This class streams RGBA frames either to an ffmpeg process (any output
+    that is not a PNG file name pattern) or to numbered PNG files (output
+    containing a % format, e.g. frames/frame_%05d.png).
+    """
+
+    # --------------------------------------------------------------------------
+
+    def __init__(self, output, width, height, fps=30):
+        self.output = output
+        self.num_frames = 0
+        self._process = None
+        if '%' in output:
+            _folder = os.path.dirname(output)
+            if _folder and not os.path.exists(_folder):
+                os.makedirs(_folder)
+        else:
+            import subprocess
+            import matplotlib
+            self._process = subprocess.Popen([matplotlib.rcParams['animation.ffmpeg_path'], '-y',
+                                              '-loglevel', 'error',
+                                              '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                                              '-s', '%dx%d' % (width, height), '-r', str(fps),
+                                              '-i', '-', '-pix_fmt', 'yuv420p',
+                                              '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', output],
+                                             stdin=subprocess.PIPE)
+
+    # --------------------------------------------------------------------------
+
+    def write(self, rgba):
+        """
+        Writes one (height,width,4) uint8 frame.
+        """
+        if self._process is None:
+            import matplotlib.image as mimage
+            # fast zlib level, the default one dominates the frame time:
+            mimage.imsave(self.output % self.num_frames, rgba, pil_kwargs={'compress_level': 1})
+        else:
+            self._process.stdin.write(np.ascontiguousarray(rgba).tobytes())
+        self.num_frames += 1
+
+    # --------------------------------------------------------------------------
+
+    def close(self):
+        """
+        Finishes the output.
+        """
+        if self._process is not None:
+            self._process.stdin.close()
+            if self._process.wait() != 0:
+                raise RuntimeError('ffmpeg failed writing '+str(self.output))
+
+    # --------------------------------------------------------------------------
+
+# ******************************************************************************
+# rendering:
+
+def render( run, output, enlargement=1.2, fps=30, dpi=150, limits=5., gaussian_contours=True ):
+    """
+    This function renders a run to a video or a PNG sequence.
+
+    :param run: generator of (iteration, live points), e.g. :func:`toy_run`.
+    :param output: output file, see :class:`frame_writer`.
+    :type output: :class:`string`
+    :param enlargement: covariance enlargement of the expanded ellipse.
+    :param fps: frames per second of the video.
+    :param dpi: resolution of the frames.
+    :param limits: half width of the plotted region, or (xmin, xmax, ymin, ymax).
+    :param gaussian_contours: if True draw the 1, 2, 3 sigma contours of the
+        toy Gaussian likelihood in the background.
+
+    :return: number of frames written.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import color_utilities as cu
+    import statistics_utilities as su
+
+    # static background, drawn once:
+    fig = plt.figure(figsize=(12./2.54, 12./2.54), dpi=dpi)
+    ax = fig.add_axes([0.01, 0.01, 0.98, 0.98])
+    if np.ndim(limits) == 0:
+        limits = (-limits, limits, -limits, limits)
+    ax.set_xlim(limits[0], limits[1])
+    ax.set_ylim(limits[2], limits[3])
+    ax.set_xticks([])
+    ax.set_yticks([])
+    if gaussian_contours:
+        X, Y = np.meshgrid(np.linspace(limits[0], limits[1], 200), np.linspace(limits[2], limits[3], 200))
+        Z = 1 / (2 * np.pi) * np.exp(-(np.power(X, 2) + np.power(Y, 2)) / 2)
+        levels = su.gaussian_credible_levels(2, [0.997, 0.95, 0.68])
+        ax.contour(X, Y, Z, levels=levels, colors=[cu.nice_colors(2)])
+
+    # animated artists, updated in place:
+    points, = ax.plot([], [], ls='none', marker='.', color='red', animated=True)
+    ellipse, = ax.plot([], [], ls='--', color='red', animated=True)
+    expanded, = ax.plot([], [], ls='-.', color='orange', animated=True)
+    label = ax.text(0.03, 0.97, '', transform=ax.transAxes, va='top', animated=True)
+    artists = [points, ellipse, expanded, label]
+
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    width, height = fig.canvas.get_width_height()
+    writer = frame_writer(output, width, height, fps=fps)
+    try:
+        for it, live in run:
+            mean, bound, expand = bounding_ellipse(live, enlargement)
+            points.set_data(live[:, 0], live[:, 1])
+            ellipse.set_data(*pu.ellipse_outline(mean, bound))
+            expanded.set_data(*pu.ellipse_outline(mean, expand))
+            label.set_text('iteration %d' % it)
+            # blit the changing artists on the cached background:
+            fig.canvas.restore_region(background)
+            for artist in artists:
+                ax.draw_artist(artist)
+            writer.write(np.asarray(fig.canvas.buffer_rgba()))
+    finally:
+        writer.close()
+        plt.close(fig)
+    return writer.num_frames
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Animated replay of a nested sampling run.')
+    parser.add_argument('output', help='video file (e.g. run.mp4) or PNG pattern (e.g. frames/frame_%%05d.png)')
+    parser.add_argument('--dead-birth', default=None,
+                        help='PolyChord dead-birth file to replay (default: toy MultiNest run)')
+    parser.add_argument('--params', type=int, nargs=2, default=[0, 1],
+                        help='columns of the parameters to show, for --dead-birth')
+    parser.add_argument('--nlive', type=int, default=100, help='live points of the toy run')
+    parser.add_argument('--iterations', type=int, default=1000, help='iterations of the toy run')
+    parser.add_argument('--every', type=int, default=1, help='iterations per frame, for --dead-birth')
+    parser.add_argument('--enlargement', type=float, default=1.2, help='covariance enlargement factor')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--dpi', type=int, default=150)
+    args = parser.parse_args()
+
+    if args.dead_birth is None:
+        run = toy_run(num_live=args.nlive, num_iterations=args.iterations, enlargement=args.enlargement)
+        frames = render(run, args.output, enlargement=args.enlargement, fps=args.fps, dpi=args.dpi)
+    else:
+        import chain_utilities as chu
+        x, y = chu.load_columns(args.dead_birth, args.params)
+        limits = (np.min(x), np.max(x), np.min(y), np.max(y))
+        run = dead_birth_run(args.dead_birth, params=args.params, every=args.every)
+        frames = render(run, args.output, enlargement=args.enlargement, fps=args.fps, dpi=args.dpi,
+                        limits=limits, gaussian_contours=False)
+    print('written '+str(frames)+' frames to '+args.output)
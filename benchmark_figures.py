@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the figure pipelines on synthetic inputs.
+
+For each input size, synthetic chains and tables are written with
+synthetic_data and every plot script is run, in a new interpreter, first
+with an empty cache (cold) and then again with the cache filled by the
+first run (warm). The scripts themselves are run, with profiling enabled,
+so the stages are the phases they profile (imports, load, statistics,
+plot, latex, save, ... see profiling_utilities). Wall time, CPU time and
+peak traced memory of every stage go to a JSON report, to be compared
+between revisions. Times are measured without memory tracing, that slows
+down the traced code, and the peak memory in a second cold and warm pass.
+
+Usage:
+    python benchmark_figures.py [--sizes small medium ...] [--figures ...] [--output report.json]
+
+Sizes are presets (see sizes below) or samples:params:seeds, e.g. 200000:6:100.
+"""
+
+# ******************************************************************************
+
+import os
+import sys
+import glob
+import time
+import json
+import shutil
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+# ******************************************************************************
+# benchmark sizes:
+
+sizes = {'small': {'samples': 10000, 'params': 3, 'seeds': 10},
+         'medium': {'samples': 100000, 'params': 6, 'seeds': 100},
+         'large': {'samples': 1000000, 'params': 10, 'seeds': 1000},
+         }
+
+# ------------------------------------------------------------------------------
+
+def parse_size( size ):
+    """
+    Returns the size dictionary of a preset name or of a samples:params:seeds
+    string.
+    """
+    if size in sizes:
+        return dict(sizes[size])
+    try:
+        _samples, _params, _seeds = [ int(float(_s)) for _s in size.split(':') ]
+    except ValueError:
+        raise ValueError('Size must be one of '+str(list(sizes.keys()))+' or samples:params:seeds, got '+str(size))
+    return {'samples': _samples, 'params': _params, 'seeds': _seeds}
+
+# ******************************************************************************
+# definition of the benchmark driver:
+
+def _clear_caches( folder ):
+    """
+    Empties the on-disk cache of the benchmark folder, so that the next run
+    is cold. Each script runs in a new interpreter, which reads the cache
+    location (SAMPLER_PLOTS_CACHE) again and has no in-process memo.
+    """
+    shutil.rmtree(os.path.join(folder, '.cache'), ignore_errors=True)
+
+# ------------------------------------------------------------------------------
+
+def run_script( figure, folder, repository, memory=False ):
+    """
+    This function runs a plot script, as build_figures.py does, in a new
+    interpreter working in the benchmark folder, with profiling enabled, and
+    returns its phases as written by profiling_utilities.
+
+    :param figure: figure declaration, see build_figures.discover_figures.
+    :param folder: benchmark folder, with the synthetic inputs.
+    :type folder: :class:`string`
+    :param repository: folder of the plot scripts and modules.
+    :type repository: :class:`string`
+    :param memory: if True trace the peak memory of the phases, which slows
+        them down, otherwise time them only.
+    :type memory: :class:`bool`
+
+    :return: tuple with the list of phases (dictionaries with 'stage',
+        'wall', 'cpu' and 'peak_memory'), the total wall time and the error
+        output (None if the script succeeded).
+    """
+    _profiles = os.path.join(folder, 'profiles')
+    shutil.rmtree(_profiles, ignore_errors=True)
+    _env = dict(os.environ)
+    _env.update({'SAMPLER_PLOTS_CACHE': os.path.join(folder, '.cache'),
+                 'SAMPLER_PLOTS_PROFILE': _profiles,
+                 'SAMPLER_PLOTS_PROFILE_MEMORY': '1' if memory else '0',
+                 'SAMPLER_PLOTS_BATCH': '1',
+                 'MPLBACKEND': 'Agg',
+                 })
+    _start = time.perf_counter()
+    _process = subprocess.run([sys.executable, os.path.join(repository, os.path.basename(figure['script']))],
+                              cwd=folder, env=_env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+    _total = time.perf_counter()-_start
+    _error = None if _process.returncode == 0 else _process.stdout
+    _phases = []
+    for _trace in glob.glob(os.path.join(_profiles, '*.trace.json')):
+        with open(_trace) as _file:
+            _events = json.load(_file)['traceEvents']
+        for _event in sorted(_events, key=lambda _e: _e['ts']):
+            _phase = {'stage': _event['name']}
+            _phase.update(_event['args'])
+            _phases.append(_phase)
+    return _phases, _total, _error
+
+# ------------------------------------------------------------------------------
+
+def run_benchmarks( size_names, figures=None, folder=None, memory=True, keep=False ):
+    """
+    This function generates the synthetic inputs of each size and runs the
+    plot scripts, cold and warm, collecting the phases they profile: once
+    timing them and, if memory is True, once more tracing their peak memory.
+
+    :param size_names: list of sizes, see :func:`parse_size`.
+    :type size_names: :class:`list`
+    :param figures: names of the figures to benchmark (as accepted by
+        build_figures.py), defaults to all of them.
+    :type figures: :class:`list`
+    :param folder: working folder, defaults to a temporary one.
+    :type folder: :class:`string`
+    :param memory: if True measure the peak memory in a separate pass.
+    :type memory: :class:`bool`
+    :param keep: if True do not delete the working folder.
+    :type keep: :class:`bool`
+
+    :return: dictionary with the report.
+    """
+    _repo = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, _repo)
+    import matplotlib
+    import build_figures as bf
+    import synthetic_data as sd
+    _figures = bf.select_figures(bf.discover_figures(_repo), figures)
+    _folder = os.path.abspath(folder) if folder is not None else tempfile.mkdtemp(prefix='sampler_plots_bench_')
+    _report = {'environment': {'python': platform.python_version(),
+                               'platform': platform.platform(),
+                               'cpu_count': os.cpu_count(),
+                               'numpy': np.__version__,
+                               'matplotlib': matplotlib.__version__,
+                               'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                               },
+               'sizes': {},
+               'results': [],
+               'failures': [],
+               }
+    try:
+        os.makedirs(os.path.join(_folder, 'paper_plots'), exist_ok=True)
+        for _name in size_names:
+            _size = parse_size(_name)
+            _report['sizes'][_name] = _size
+            _start = time.perf_counter()
+            sd.generate(_folder, num_samples=_size['samples'], num_params=_size['params'],
+                        num_seeds=_size['seeds'])
+            print('%s: generated inputs in %.1f s' % (_name, time.perf_counter()-_start))
+            for _figure in _figures:
+                # timing pass, then memory pass:
+                _runs = {}
+                for _memory in [False, True] if memory else [False]:
+                    for _cache in ['cold', 'warm']:
+                        if _cache == 'cold':
+                            _clear_caches(_folder)
+                        _runs[(_memory, _cache)] = run_script(_figure, _folder, _repo, memory=_memory)
+                for _cache in ['cold', 'warm']:
+                    _phases, _total, _error = _runs[(False, _cache)]
+                    if _error is None and memory:
+                        _memory_phases, _, _error = _runs[(True, _cache)]
+                        if _error is None:
+                            for _phase, _memory_phase in zip(_phases, _memory_phases):
+                                if _phase['stage'] == _memory_phase['stage']:
+                                    _phase['peak_memory'] = _memory_phase['peak_memory']
+                    if _error is not None:
+                        print('%-30s %-8s %-5s FAILED' % (_figure['name'], _name, _cache))
+                        _report['failures'].append({'figure': _figure['name'], 'size': _name,
+                                                    'cache': _cache, 'error': _error})
+                        continue
+                    _phases.append({'stage': 'total', 'wall': _total, 'cpu': None, 'peak_memory': None})
+                    for _phase in _phases:
+                        _phase.update({'figure': _figure['name'], 'size': _name, 'cache': _cache})
+                        _report['results'].append(_phase)
+                        print('%-30s %-8s %-5s %-14s %8.3f s %10s' % (
+                              _figure['name'], _name, _cache, _phase['stage'], _phase['wall'],
+                              '' if _phase['peak_memory'] is None else '%.1f MB' % (_phase['peak_memory']/2.**20)))
+    finally:
+        if not keep and folder is None:
+            shutil.rmtree(_folder, ignore_errors=True)
+    return _report
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the figure pipelines on synthetic inputs.')
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'],
+                        help='sizes: '+', '.join(sizes.keys())+' or samples:params:seeds')
+    parser.add_argument('--figures', nargs='+', default=None,
+                        help='plot scripts to benchmark (default: all of them)')
+    parser.add_argument('--output', default='benchmark_report.json', help='JSON report file')
+    parser.add_argument('--folder', default=None, help='working folder (default: temporary)')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure the peak memory (no second pass)')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary working folder')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, figures=args.figures, folder=args.folder,
+                            memory=not args.no_memory, keep=args.keep)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=1)
+    print('report written to '+args.output)
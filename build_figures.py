@@ -0,0 +1,627 @@
+# -*- coding: utf-8 -*-
+
+"""
+Build driver for all the paper figures.
+
+Discovers the plot_*.py scripts, reads the files that each of them declares
+to read (figure_inputs, and figure_optional_inputs that are used when
+present) and to write (figure_output: the figure, written in all the output
+formats, optionally followed by side outputs such as reports) and renders
+the figures that are out of date in a pool of processes.
+
+A figure is out of date when the content of its script, of the repository
+modules it imports (colors, style, ...) or of its input files changed since
+its output was rendered: each render is keyed by a digest of all of them,
+stored in the cache, so that an unchanged figure is never imported nor
+recomputed, whatever the modification times of the files.
+
+Usage:
+    python build_figures.py [--force] [--draft] [--watch] [--profile] [--formats pdf,png,svg]
+                             [--jobs N] [--clean] [figure ...]
+"""
+
+# ******************************************************************************
+
+import os
+import ast
+import sys
+import json
+import glob
+import time
+import fnmatch
+import argparse
+import concurrent.futures
+
+import cache_utilities as cache
+
+# ******************************************************************************
+# discovery of the figure scripts:
+
+def read_figure_declarations( script ):
+    """
+    This function reads the figure_inputs, figure_optional_inputs and
+    figure_output declarations of a plot script without executing it.
+
+    :param script: path of the plot script.
+    :type script: :class:`string`
+
+    :return: dictionary with the script name, the lists of required and
+        optional input patterns, the output file and the side output files,
+        or None if the script does not declare an output.
+    """
+    with open(script) as _file:
+        _tree = ast.parse(_file.read(), filename=script)
+    _declarations = {}
+    for _node in _tree.body:
+        if not isinstance(_node, ast.Assign):
+            continue
+        for _target in _node.targets:
+            if isinstance(_target, ast.Name) and _target.id in ['figure_inputs', 'figure_optional_inputs', 'figure_output']:
+                _declarations[_target.id] = ast.literal_eval(_node.value)
+    if 'figure_output' not in _declarations:
+        return None
+    # the figure, then its side outputs:
+    _outputs = _declarations['figure_output']
+    if isinstance(_outputs, str):
+        _outputs = [_outputs]
+    return {'script': script,
+            'name': os.path.splitext(os.path.basename(script))[0],
+            'inputs': list(_declarations.get('figure_inputs', [])),
+            'optional_inputs': list(_declarations.get('figure_optional_inputs', [])),
+            'output': _outputs[0],
+            'side_outputs': list(_outputs[1:]),
+            }
+
+# ------------------------------------------------------------------------------
+
+def discover_figures( folder='.' ):
+    """
+    This function returns the declarations of all the plot_*.py scripts in
+    a folder, sorted by name.
+
+    :param folder: folder containing the plot scripts.
+    :type folder: :class:`string`
+
+    :return: list of dictionaries, see :func:`read_figure_declarations`.
+    """
+    _figures = []
+    for _script in sorted(glob.glob(os.path.join(folder, 'plot_*.py'))):
+        _figure = read_figure_declarations(_script)
+        if _figure is not None:
+            _figures.append(_figure)
+    return _figures
+
+# ------------------------------------------------------------------------------
+
+def expand_inputs( figure, folder='.' ):
+    """
+    This function expands the input patterns of a figure, required and
+    optional, into the sorted list of files that currently match them.
+
+    :param figure: figure declaration, see :func:`read_figure_declarations`.
+    :param folder: folder the patterns are relative to.
+    :type folder: :class:`string`
+
+    :return: list of file paths.
+    """
+    _files = set()
+    for _pattern in figure['inputs']+figure['optional_inputs']:
+        _files.update(glob.glob(os.path.join(folder, _pattern)))
+    return sorted(_files)
+
+# ------------------------------------------------------------------------------
+
+def missing_inputs( figure, folder='.' ):
+    """
+    This function returns the required input patterns of a figure that do
+    not match any file.
+    """
+    return [ _p for _p in figure['inputs'] if len(glob.glob(os.path.join(folder, _p))) == 0 ]
+
+# ------------------------------------------------------------------------------
+
+_local_modules_memory = {}
+
+def _modification_times( files ):
+    """
+    Returns the modification times of files, None for the missing ones.
+    """
+    return tuple( os.stat(_f).st_mtime_ns if os.path.exists(_f) else None for _f in files )
+
+# ------------------------------------------------------------------------------
+
+def local_modules( script, folder='.' ):
+    """
+    This function returns the modules of the repository that a script
+    imports, directly or through other modules of the repository.
+    The result is remembered until the script or one of these modules is
+    modified, so that polling in watch mode does not parse them every time.
+
+    :param script: path of the script.
+    :type script: :class:`string`
+    :param folder: repository folder.
+    :type folder: :class:`string`
+
+    :return: sorted list of module file paths.
+    """
+    _key = (os.path.abspath(script), os.path.abspath(folder))
+    _known = _local_modules_memory.get(_key)
+    if _known is not None and _modification_times([script]+_known[1]) == _known[0]:
+        return list(_known[1])
+    _modules = _find_local_modules(script, folder)
+    _local_modules_memory[_key] = (_modification_times([script]+_modules), _modules)
+    return list(_modules)
+
+# ------------------------------------------------------------------------------
+
+def _find_local_modules( script, folder='.' ):
+    """
+    Parses a script and the repository modules it imports, see
+    :func:`local_modules`.
+    """
+    _found = set()
+    _todo = [script]
+    while len(_todo) > 0:
+        with open(_todo.pop()) as _file:
+            _tree = ast.parse(_file.read())
+        for _node in ast.walk(_tree):
+            if isinstance(_node, ast.Import):
+                _names = [ _a.name for _a in _node.names ]
+            elif isinstance(_node, ast.ImportFrom) and _node.module is not None:
+                _names = [_node.module]
+            else:
+                continue
+            for _name in _names:
+                _module = os.path.join(folder, _name.split('.')[0]+'.py')
+                if os.path.exists(_module) and _module not in _found:
+                    _found.add(_module)
+                    _todo.append(_module)
+    return sorted(_found)
+
+# ------------------------------------------------------------------------------
+
+def figure_dependencies( figure, folder='.' ):
+    """
+    This function returns all the files a figure depends on: the script
+    itself, the repository modules it imports and the matching input files.
+    """
+    _files = [figure['script']]
+    _files += local_modules(figure['script'], folder)
+    _files += expand_inputs(figure, folder)
+    return _files
+
+# ------------------------------------------------------------------------------
+
+def _mode_path( path, mode='final' ):
+    """
+    Returns the path of an output file in the given render mode: draft
+    outputs are written in the draft/ sub-folder of the final output folder
+    (see plot_utilities.output_folder).
+    """
+    if mode == 'draft':
+        return os.path.join(os.path.dirname(path), 'draft', os.path.basename(path))
+    return path
+
+# ------------------------------------------------------------------------------
+
+def output_path( figure, mode='final' ):
+    """
+    This function returns the output file of a figure in the given render
+    mode, see :func:`_mode_path`.
+    """
+    return _mode_path(figure['output'], mode)
+
+# ------------------------------------------------------------------------------
+
+def output_files( figure, folder='.', mode='final' ):
+    """
+    This function returns the absolute paths of the files written by a
+    figure: the figure in all the output formats and its side outputs.
+    """
+    from plot_utilities import output_formats
+    _root = os.path.splitext(os.path.abspath(os.path.join(folder, output_path(figure, mode))))[0]
+    return [ _root+'.'+_format for _format in output_formats() ] + \
+           [ os.path.abspath(os.path.join(folder, _mode_path(_o, mode))) for _o in figure['side_outputs'] ]
+
+# ------------------------------------------------------------------------------
+
+def render_key( figure, folder='.', mode='final' ):
+    """
+    This function returns the key of the render of a figure: a digest of the
+    content of all its dependencies (see :func:`figure_dependencies`), of the
+    render mode, of the output file and of the output formats.
+    """
+    from plot_utilities import output_formats
+    return cache.files_digest(figure_dependencies(figure, folder),
+                              extra=(mode, output_path(figure, mode), output_formats(), figure['side_outputs']))
+
+# ------------------------------------------------------------------------------
+
+def _render_keys_file():
+    """
+    Returns the file storing the keys of the rendered figures.
+    """
+    return os.path.join(cache.cache_folder(), 'renders.json')
+
+# ------------------------------------------------------------------------------
+
+def load_render_keys():
+    """
+    This function returns the stored render keys, a dictionary keyed by the
+    absolute output path with the render key and the digest of the outputs
+    in all the formats.
+    """
+    _keys_file = _render_keys_file()
+    if not os.path.exists(_keys_file):
+        return {}
+    try:
+        with open(_keys_file) as _file:
+            return json.load(_file)
+    except ValueError:
+        return {}
+
+# ------------------------------------------------------------------------------
+
+def store_render_key( figure, key, folder='.', mode='final' ):
+    """
+    This function stores the key of a successful render, together with the
+    digest of its outputs.
+    """
+    _outputs = output_files(figure, folder, mode)
+    if not all( os.path.exists(_o) for _o in _outputs ):
+        return
+    _keys = load_render_keys()
+    _keys[os.path.abspath(os.path.join(folder, output_path(figure, mode)))] = [key, cache.files_digest(_outputs)]
+    _write_render_keys(_keys)
+
+# ------------------------------------------------------------------------------
+
+def _write_render_keys( keys ):
+    """
+    Writes the render keys, see :func:`load_render_keys`.
+    """
+    _keys_file = _render_keys_file()
+    _temp = cache.temporary_name(_keys_file)
+    with open(_temp, 'w') as _file:
+        json.dump(keys, _file, indent=1)
+    os.replace(_temp, _keys_file)
+
+# ------------------------------------------------------------------------------
+
+def is_out_of_date( figure, folder='.', mode='final', key=None, keys=None ):
+    """
+    This function returns True if an output of a figure is missing, was
+    modified after its render or was rendered from different dependencies.
+
+    :param key: render key of the figure, computed if not given.
+    :param keys: stored render keys, loaded if not given.
+    """
+    _outputs = output_files(figure, folder, mode)
+    if not all( os.path.exists(_o) for _o in _outputs ):
+        return True
+    if key is None:
+        key = render_key(figure, folder, mode)
+    if keys is None:
+        keys = load_render_keys()
+    _stored = keys.get(os.path.abspath(os.path.join(folder, output_path(figure, mode))))
+    if _stored is None or _stored[0] != key:
+        return True
+    return cache.files_digest(_outputs) != _stored[1]
+
+# ------------------------------------------------------------------------------
+
+def clean( figures, folder='.', mode='final' ):
+    """
+    This function removes the outputs of figures, in all the formats and
+    their side outputs, together with their render keys.
+
+    :return: list of the removed files.
+    """
+    _keys = load_render_keys()
+    _removed = []
+    for _f in figures:
+        for _output in output_files(_f, folder, mode):
+            if os.path.exists(_output):
+                os.remove(_output)
+                _removed.append(_output)
+        _keys.pop(os.path.abspath(os.path.join(folder, output_path(_f, mode))), None)
+    _write_render_keys(_keys)
+    return _removed
+
+# ******************************************************************************
+# rendering:
+
+def _init_worker( folder, mode, cores=None ):
+    """
+    Initializer of the worker processes: scripts are run from the repository
+    folder, in the requested render mode, can import the shared modules and
+    run in batch mode, with no GUI and no window. The pools of the scripts
+    (e.g. getdist_utilities.precompute_densities) use at most cores
+    processes (SAMPLER_PLOTS_CORES), all the cores if None.
+    """
+    os.environ['MPLBACKEND'] = 'Agg'
+    os.environ['SAMPLER_PLOTS_BATCH'] = '1'
+    if cores is None:
+        os.environ.pop('SAMPLER_PLOTS_CORES', None)
+    else:
+        os.environ['SAMPLER_PLOTS_CORES'] = str(cores)
+    os.environ['SAMPLER_PLOTS_MODE'] = mode
+    os.chdir(folder)
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+
+# ------------------------------------------------------------------------------
+
+def _clear_profile():
+    """
+    Forgets the phases profiled by the previous script, if any (e.g. when it
+    failed before writing its trace).
+    """
+    if 'profiling_utilities' in sys.modules:
+        sys.modules['profiling_utilities'].clear()
+
+# ------------------------------------------------------------------------------
+
+def render_figure( script ):
+    """
+    This function runs a plot script as if it was called from the command
+    line, inside a worker process.
+
+    :param script: path of the plot script.
+    :type script: :class:`string`
+
+    :return: tuple with the script, the elapsed time and the error message
+        (None if the script run successfully).
+    """
+    import runpy
+    import traceback
+    _start = time.time()
+    _error = None
+    _clear_profile()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except BaseException:
+        _error = traceback.format_exc()
+    finally:
+        # workers are reused, do not leak figures, settings and profiled
+        # phases to the next job:
+        _clear_profile()
+        if 'matplotlib.pyplot' in sys.modules:
+            import matplotlib
+            import matplotlib.pyplot as plt
+            plt.close('all')
+            matplotlib.rcdefaults()
+    return script, time.time()-_start, _error
+
+# ------------------------------------------------------------------------------
+
+def finish_render( figure, key, result, folder='.', mode='final' ):
+    """
+    This function reports the result of the render of a figure and, if it
+    succeeded, stores its render key (see :func:`store_render_key`), so that
+    the figure is up to date for the next builds. Used by :func:`build` and
+    by the render server.
+
+    :param figure: figure declaration, see :func:`read_figure_declarations`.
+    :param key: render key computed before the render, see :func:`render_key`.
+    :type key: :class:`string`
+    :param result: (script, elapsed time, error) tuple returned by
+        :func:`render_figure`.
+    :type result: :class:`tuple`
+    """
+    _script, _elapsed, _error = result
+    _name = os.path.basename(_script)
+    if _error is None:
+        print('rendered %s in %.1f s' % (_name, _elapsed))
+        store_render_key(figure, key, folder, mode)
+    else:
+        print('FAILED %s after %.1f s:\n%s' % (_name, _elapsed, _error))
+
+# ------------------------------------------------------------------------------
+
+def build( figures, folder='.', max_workers=None, force=False, mode='final' ):
+    """
+    This function renders the out of date figures in a pool of processes.
+
+    :param figures: list of figure declarations, see :func:`discover_figures`.
+    :param folder: repository folder.
+    :type folder: :class:`string`
+    :param max_workers: number of worker processes. Defaults to the number of cores.
+    :type max_workers: :class:`int`
+    :param force: if True render all figures regardless of their state.
+    :type force: :class:`bool`
+    :param mode: render mode, 'final' or 'draft' (see plot_utilities).
+    :type mode: :class:`string`
+
+    :return: list of (script, elapsed time, error) tuples for the rendered figures.
+    """
+    _folder = os.path.abspath(folder)
+    _keys = load_render_keys()
+    _todo = []
+    for _f in figures:
+        _missing = missing_inputs(_f, _folder)
+        if len(_missing) > 0:
+            print('skipping %s, missing inputs: %s' % (output_path(_f, mode), ', '.join(_missing)))
+            continue
+        # the key is computed before rendering, a change during the render
+        # leaves the figure out of date:
+        _key = render_key(_f, _folder, mode)
+        if force or is_out_of_date(_f, _folder, mode, key=_key, keys=_keys):
+            _todo.append((_f, _key))
+        else:
+            print('up to date: '+output_path(_f, mode))
+    if len(_todo) == 0:
+        return []
+    # the cores not taken by the pool are shared by the pools of the scripts:
+    _num_cores = os.cpu_count() or 1
+    _num_workers = min(len(_todo), max_workers or _num_cores)
+    _results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=_num_workers,
+                                                initializer=_init_worker,
+                                                initargs=(_folder, mode, max(1, _num_cores//_num_workers))) as _pool:
+        _jobs = { _pool.submit(render_figure, os.path.abspath(_f['script'])): (_f, _key)
+                  for _f, _key in _todo }
+        for _job in concurrent.futures.as_completed(_jobs):
+            _f, _key = _jobs[_job]
+            finish_render(_f, _key, _job.result(), _folder, mode)
+            _results.append(_job.result())
+    return _results
+
+# ******************************************************************************
+# watch mode:
+
+def snapshot( figures, folder='.' ):
+    """
+    This function returns the state (size and modification time) of all the
+    files the given figures depend on.
+
+    :return: dictionary of (size, mtime) tuples keyed by file path.
+    """
+    _state = {}
+    for _f in figures:
+        for _file in figure_dependencies(_f, folder):
+            if _file not in _state and os.path.exists(_file):
+                _stat = os.stat(_file)
+                _state[_file] = (_stat.st_size, _stat.st_mtime_ns)
+    return _state
+
+# ------------------------------------------------------------------------------
+
+def changed_files( old_state, new_state ):
+    """
+    This function returns the files that were added, modified or removed
+    between two snapshots.
+    """
+    _files = set(old_state.keys()) | set(new_state.keys())
+    return sorted( _f for _f in _files if old_state.get(_f) != new_state.get(_f) )
+
+# ------------------------------------------------------------------------------
+
+def affected_figures( figures, files, folder='.' ):
+    """
+    This function returns the figures that depend on any of the given files:
+    their script, the repository modules they import or their inputs
+    (matched against the input patterns, so that new files count too).
+    """
+    _files = set( os.path.abspath(_f) for _f in files )
+    _affected = []
+    for _f in figures:
+        _deps = set( os.path.abspath(_d) for _d in [_f['script']]+local_modules(_f['script'], folder) )
+        _patterns = [ os.path.abspath(os.path.join(folder, _p)) for _p in _f['inputs']+_f['optional_inputs'] ]
+        if _files & _deps or any( fnmatch.fnmatch(_file, _p) for _file in _files for _p in _patterns ):
+            _affected.append(_f)
+    return _affected
+
+# ------------------------------------------------------------------------------
+
+def watch( names, folder='.', max_workers=None, mode='final', interval=1.0, quiet=3.0 ):
+    """
+    This function watches the inputs, scripts and modules of the figures and
+    re-renders only the figures affected by each change. Changes are
+    debounced: a rebuild starts only once no file has changed for quiet
+    seconds, so that a sampler still flushing its output triggers one
+    rebuild. Runs until interrupted.
+
+    :param names: figures to watch, see :func:`select_figures`.
+    :type names: :class:`list`
+    :param folder: repository folder.
+    :type folder: :class:`string`
+    :param max_workers: number of worker processes.
+    :type max_workers: :class:`int`
+    :param mode: render mode, 'final' or 'draft'.
+    :type mode: :class:`string`
+    :param interval: seconds between two polls of the files.
+    :type interval: :class:`float`
+    :param quiet: seconds without changes before rebuilding.
+    :type quiet: :class:`float`
+    """
+    _figures = select_figures(discover_figures(folder), names)
+    # the state is taken before each build, files written while the figures
+    # render show up as changes at the next poll:
+    _state = snapshot(_figures, folder)
+    build(_figures, folder=folder, max_workers=max_workers, mode=mode)
+    _pending = set()
+    _last_change = None
+    print('watching '+str(len(_state))+' files, press Ctrl-C to stop')
+    try:
+        while True:
+            time.sleep(interval)
+            _new_state = snapshot(_figures, folder)
+            _changed = changed_files(_state, _new_state)
+            _state = _new_state
+            if len(_changed) > 0:
+                _pending.update(_changed)
+                _last_change = time.time()
+                continue
+            if len(_pending) == 0 or time.time()-_last_change < quiet:
+                continue
+            # files settled, rebuild what they affect:
+            _figures = select_figures(discover_figures(folder), names)
+            _todo = affected_figures(_figures, _pending, folder)
+            print('changed: '+', '.join( os.path.relpath(_f, folder) for _f in sorted(_pending) ))
+            _pending = set()
+            if len(_todo) > 0:
+                build(_todo, folder=folder, max_workers=max_workers, mode=mode)
+    except KeyboardInterrupt:
+        pass
+
+# ******************************************************************************
+
+def select_figures( figures, names ):
+    """
+    This function selects the figures matching the names given on the command
+    line (script name, with or without extension, or output file name).
+    """
+    if not names:
+        return figures
+    _selected = []
+    for _name in names:
+        _matches = [ _f for _f in figures
+                     if _name in [_f['name'], os.path.basename(_f['script']),
+                                  _f['output'], os.path.basename(_f['output'])] ]
+        if len(_matches) == 0:
+            raise ValueError('Requested figure ('+str(_name)+') does not exist.')
+        _selected += [ _f for _f in _matches if _f not in _selected ]
+    return _selected
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Render the paper figures.')
+    parser.add_argument('figures', nargs='*',
+                        help='plot scripts to consider (default: all of them)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='render even if the output is up to date')
+    parser.add_argument('-d', '--draft', action='store_true',
+                        help='fast draft rendering (mathtext, rasterized dense artists) into paper_plots/draft/')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: number of cores)')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='keep running and re-render the figures affected by each change')
+    parser.add_argument('-p', '--profile', action='store_true',
+                        help='profile the phases of the scripts, see profiling_utilities')
+    parser.add_argument('--formats', default=None,
+                        help='comma separated output formats, e.g. pdf,png,svg (default: pdf)')
+    parser.add_argument('--clean', action='store_true',
+                        help='remove the outputs of the figures (in all the formats, with their side outputs)')
+    args = parser.parse_intermixed_args()
+    if args.profile:
+        os.environ.setdefault('SAMPLER_PLOTS_PROFILE', '1')
+    if args.formats is not None:
+        os.environ['SAMPLER_PLOTS_FORMATS'] = args.formats
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+    if args.watch:
+        watch(args.figures, folder=folder, max_workers=args.jobs,
+              mode='draft' if args.draft else 'final')
+        sys.exit(0)
+    figures = select_figures(discover_figures(folder), args.figures)
+    if args.clean:
+        for removed in clean(figures, folder=folder, mode='draft' if args.draft else 'final'):
+            print('removed '+os.path.relpath(removed, folder))
+        sys.exit(0)
+    results = build(figures, folder=folder, max_workers=args.jobs, force=args.force,
+                    mode='draft' if args.draft else 'final')
+    if any( _r[2] is not None for _r in results ):
+        sys.exit(1)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing the on-disk cache helpers shared by the plot scripts.
+
+Cached files live in the .cache folder of the repository, or in the folder
+given by the SAMPLER_PLOTS_CACHE environment variable. Everything in there
+can be safely deleted at any time.
+
+"""
+
+# ******************************************************************************
+
+import os
+import json
+import hashlib
+
+# ******************************************************************************
+# location of the cache:
+
+cache_root = os.environ.get('SAMPLER_PLOTS_CACHE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# ******************************************************************************
+# definition of the cache utilities:
+
+def cache_folder( *subfolders ):
+    """
+    This function returns (and creates if needed) a folder inside the cache.
+
+    :param subfolders: names of the nested sub-folders.
+    :type subfolders: :class:`string`
+
+    :return: path of the folder.
+    """
+    _folder = os.path.join(cache_root, *subfolders)
+    if not os.path.exists(_folder):
+        os.makedirs(_folder, exist_ok=True)
+    return _folder
+
+# ------------------------------------------------------------------------------
+
+def temporary_name( path ):
+    """
+    This function returns a temporary file name, unique to this process,
+    next to the given path. Files are written there and then moved in place
+    with :func:`os.replace`, so that concurrent readers never see a partially
+    written cache file.
+    """
+    return path+'.tmp'+str(os.getpid())
+
+# ------------------------------------------------------------------------------
+
+_digest_memory = None
+
+def _digest_index():
+    """
+    Returns the index of the already computed file digests, keyed by the
+    absolute path and storing size, modification time and digest.
+    """
+    global _digest_memory
+    if _digest_memory is None:
+        _digest_memory = {}
+        _index_file = os.path.join(cache_root, 'digests.json')
+        if os.path.exists(_index_file):
+            try:
+                with open(_index_file) as _file:
+                    _digest_memory = json.load(_file)
+            except ValueError:
+                _digest_memory = {}
+    return _digest_memory
+
+# ------------------------------------------------------------------------------
+
+def file_digest( path, block_size=2**20 ):
+    """
+    This function returns the SHA1 digest of the content of a file.
+    Digests are remembered, together with the size and modification time of
+    the file, so that large chains are hashed only once.
+
+    :param path: path of the file.
+    :type path: :class:`string`
+
+    :return: string with the hexadecimal digest.
+    """
+    _path = os.path.abspath(path)
+    _stat = os.stat(_path)
+    _index = _digest_index()
+    _known = _index.get(_path)
+    if _known is not None and _known[0] == _stat.st_size and _known[1] == _stat.st_mtime_ns:
+        return _known[2]
+    _hash = hashlib.sha1()
+    with open(_path, 'rb') as _file:
+        for _block in iter(lambda: _file.read(block_size), b''):
+            _hash.update(_block)
+    _digest = _hash.hexdigest()
+    _index[_path] = [_stat.st_size, _stat.st_mtime_ns, _digest]
+    # save the index:
+    _index_file = os.path.join(cache_folder(), 'digests.json')
+    _temp = temporary_name(_index_file)
+    with open(_temp, 'w') as _file:
+        json.dump(_index, _file)
+    os.replace(_temp, _index_file)
+    return _digest
+
+# ------------------------------------------------------------------------------
+
+def files_digest( paths, extra=None ):
+    """
+    This function returns a single digest for the content of a list of files,
+    optionally combined with some additional information (e.g. settings).
+
+    :param paths: list of file paths. Missing files are recorded as such.
+    :type paths: :class:`list`
+    :param extra: anything with a stable :func:`repr`, hashed with the files.
+
+    :return: string with the hexadecimal digest.
+    """
+    _hash = hashlib.sha1()
+    for _path in paths:
+        _hash.update(os.path.basename(_path).encode('utf-8'))
+        if os.path.exists(_path):
+            _hash.update(file_digest(_path).encode('utf-8'))
+        else:
+            _hash.update(b'missing')
+    if extra is not None:
+        _hash.update(repr(extra).encode('utf-8'))
+    return _hash.hexdigest()
+
+# ******************************************************************************
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing utilities to read MultiNest and PolyChord text chains.
+
+Text chains can be converted to a columnar format, one contiguous binary
+file per column, that is then memory mapped so that reading one column does
+not require parsing, or even reading, the other ones.
+
+Samples with negligible weight (e.g. the early dead points of nested
+sampling chains) can be pruned before any density estimate, see
+:func:`prune_weights`.
+
+"""
+
+# ******************************************************************************
+
+import os
+import json
+import shutil
+import itertools
+import numpy as np
+
+import cache_utilities as cache
+
+# ******************************************************************************
+# definition of the columnar chain format:
+
+def _read_text_chunks( chain_file, chunk_rows ):
+    """
+    Generator returning the rows of a text chain as 2D float arrays of at
+    most chunk_rows rows each. Comment and empty lines are skipped.
+    """
+    with open(chain_file) as _file:
+        _lines = ( _l for _l in _file if _l.strip() and not _l.lstrip().startswith('#') )
+        while True:
+            _block = list(itertools.islice(_lines, chunk_rows))
+            if len(_block) == 0:
+                return
+            yield np.atleast_2d(np.loadtxt(_block, dtype=np.float64))
+
+# ------------------------------------------------------------------------------
+
+def columns_folder( chain_file ):
+    """
+    This function returns the folder of the columnar version of a text chain.
+    The folder is inside the cache and is keyed by the content of the chain.
+
+    :param chain_file: path of the text chain.
+    :type chain_file: :class:`string`
+
+    :return: path of the folder (that might not exist yet).
+    """
+    _digest = cache.file_digest(chain_file)
+    return os.path.join(cache.cache_folder('columns'),
+                        os.path.basename(chain_file)+'_'+_digest[:16])
+
+# ------------------------------------------------------------------------------
+
+def convert_to_columns( chain_file, folder=None, chunk_rows=100000 ):
+    """
+    This function converts a text chain to the columnar format: one binary
+    file of float64 values per column, plus a header.json file with the
+    number of rows and columns. The text is parsed in chunks so that memory
+    use does not depend on the size of the chain.
+
+    :param chain_file: path of the text chain.
+    :type chain_file: :class:`string`
+    :param folder: output folder. Defaults to :func:`columns_folder`.
+    :type folder: :class:`string`
+    :param chunk_rows: number of rows parsed at a time.
+    :type chunk_rows: :class:`int`
+
+    :return: path of the output folder.
+    """
+    if folder is None:
+        folder = columns_folder(chain_file)
+    if os.path.exists(os.path.join(folder, 'header.json')):
+        return folder
+    _temp = cache.temporary_name(folder)
+    os.makedirs(_temp, exist_ok=True)
+    _files = None
+    _num_rows = 0
+    try:
+        for _chunk in _read_text_chunks(chain_file, chunk_rows):
+            if _files is None:
+                _files = [ open(os.path.join(_temp, 'column_'+str(_i)+'.bin'), 'wb')
+                           for _i in range(_chunk.shape[1]) ]
+            if _chunk.shape[1] != len(_files):
+                raise ValueError('Inconsistent number of columns in '+str(chain_file))
+            for _i, _file in enumerate(_files):
+                np.ascontiguousarray(_chunk[:, _i]).tofile(_file)
+            _num_rows += _chunk.shape[0]
+    finally:
+        for _file in _files or []:
+            _file.close()
+    if _files is None:
+        raise ValueError('Empty chain: '+str(chain_file))
+    with open(os.path.join(_temp, 'header.json'), 'w') as _file:
+        json.dump({'source': os.path.basename(chain_file),
+                   'num_rows': _num_rows,
+                   'num_columns': len(_files),
+                   'dtype': 'float64'}, _file)
+    try:
+        os.replace(_temp, folder)
+    except OSError:
+        # another process converted the same chain in the meantime:
+        shutil.rmtree(_temp)
+    return folder
+
+# ------------------------------------------------------------------------------
+
+def load_columns( chain_file, usecols=None, convert=True ):
+    """
+    This function returns columns of a text chain as read-only memory mapped
+    arrays. Only the requested columns are opened and no data is read until
+    it is used.
+
+    :param chain_file: path of the text chain.
+    :type chain_file: :class:`string`
+    :param usecols: list of column indexes, as in :func:`numpy.loadtxt`.
+        Defaults to all columns.
+    :type usecols: :class:`list`
+    :param convert: if True convert the chain to the columnar format if needed.
+    :type convert: :class:`bool`
+
+    :return: list of :class:`numpy.memmap`, one per requested column.
+    """
+    _folder = columns_folder(chain_file)
+    if not os.path.exists(os.path.join(_folder, 'header.json')):
+        if not convert:
+            raise IOError('Chain has not been converted: '+str(chain_file))
+        convert_to_columns(chain_file, _folder)
+    with open(os.path.join(_folder, 'header.json')) as _file:
+        _header = json.load(_file)
+    if usecols is None:
+        usecols = range(_header['num_columns'])
+    _columns = []
+    for _i in usecols:
+        if _i < 0:
+            _i += _header['num_columns']
+        if _i < 0 or _i >= _header['num_columns']:
+            raise ValueError('Requested column ('+str(_i)+') does not exist in '+str(chain_file))
+        _columns.append(np.memmap(os.path.join(_folder, 'column_'+str(_i)+'.bin'),
+                                  dtype=_header['dtype'], mode='r',
+                                  shape=(_header['num_rows'],)))
+    return _columns
+
+# ------------------------------------------------------------------------------
+
+def load_column( chain_file, column=0 ):
+    """
+    This function returns a single column of a text chain as a memory mapped
+    array, see :func:`load_columns`. Column 0 of MultiNest and PolyChord
+    chains contains the sample weights.
+    """
+    return load_columns(chain_file, usecols=[column])[0]
+
+# ******************************************************************************
+# definition of the weight pruning:
+
+prune_methods = ['drop', 'merge']
+
+# ------------------------------------------------------------------------------
+
+def prune_weights( weights, tolerance=1.e-6, method='drop' ):
+    """
+    This function selects the samples of a chain to keep, neglecting those
+    with the smallest weights as long as, together, they carry at most a
+    fraction tolerance of the total weight.
+
+    With method 'drop' negligible samples are removed. With method 'merge'
+    each run of consecutive negligible samples is replaced by its heaviest
+    sample, carrying the weight of the whole run, so that the total weight is
+    preserved and the mass is only moved along the chain.
+
+    :param weights: the weights of the chain.
+    :type weights: :class:`numpy.ndarray`
+    :param tolerance: fraction of the total weight that can be neglected.
+    :type tolerance: :class:`float`
+    :param method: 'drop' or 'merge'.
+    :type method: :class:`string`
+
+    :return: tuple with the indexes of the kept samples, their new weights and
+        the fraction of the posterior mass that was dropped (or moved), which
+        is at most tolerance.
+    """
+    import statistics_utilities as su
+    if method not in prune_methods:
+        raise ValueError('Pruning method '+str(method)+' not supported. Supported methods: '+str(prune_methods))
+    _weights = np.asarray(weights, dtype=np.float64)
+    _total = np.sum(_weights)
+    _negligible = _weights < su.negligible_weight_threshold(_weights, tolerance)
+    _mass = float(np.sum(_weights[_negligible])/_total)
+    if method == 'drop' or not np.any(_negligible):
+        _keep = np.flatnonzero(~_negligible)
+        return _keep, _weights[_keep], _mass
+    # label the runs of consecutive negligible samples:
+    _starts = _negligible & ~np.concatenate([[False], _negligible[:-1]])
+    _run = np.cumsum(_starts)-1
+    _idx = np.flatnonzero(_negligible)
+    _run = _run[_idx]
+    _run_weights = np.bincount(_run, weights=_weights[_idx])
+    # heaviest sample of each run (last index of the sorted run, weight):
+    _order = np.lexsort((_weights[_idx], _run))
+    _last = np.concatenate([_run[_order][1:] != _run[_order][:-1], [True]])
+    _heaviest = _idx[_order][_last]
+    _new_weights = _weights.copy()
+    _new_weights[_heaviest] = _run_weights
+    _keep = np.sort(np.concatenate([np.flatnonzero(~_negligible), _heaviest]))
+    return _keep, _new_weights[_keep], _mass
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    import sys
+    # convert the chains given on the command line:
+    for _chain in sys.argv[1:]:
+        print(_chain+' -> '+convert_to_columns(_chain))
@@ -12,7 +12,6 @@ Authors:
 
 # ******************************************************************************
 
-import math
 import numpy as np
 
 # ******************************************************************************
@@ -95,6 +94,16 @@ autumn_leaves = { 0: (142./255., 26./255., 26./255.),
 shades_of_gray = { 0: (90./255., 90./255., 90./255.)
                   }
 
+# ------------------------------------------------------------------------------
+# colormaps pre-converted to (N,3) arrays, to avoid any lookup at call time:
+
+colormap_names = [ 'the_gold_standard', 'spring_and_winter', 'winter_and_spring',
+                   'summer_sun', 'summer_sky', 'autumn_fields', 'autumn_leaves',
+                   'shades_of_gray' ]
+
+_colormap_arrays = { _name: np.array([ globals()[_name][_i] for _i in range(len(globals()[_name])) ], dtype=np.float64)
+                     for _name in colormap_names }
+
 # ******************************************************************************
 # definition of color interpolation utilities:
 
@@ -102,11 +111,176 @@ def color_linear_interpolation( rgb_1, rgb_2, alpha ):
     """
     This function performs a linear color interpolation in RGB space.
     alpha has to go from zero to one and is the coordinate.
+    rgb_1 and rgb_2 can also be (N,3) arrays and alpha an array of N
+    coordinates, in which case an (N,3) array is returned.
+    """
+    if np.ndim(rgb_1) == 1 and np.ndim(alpha) == 0:
+        _out_color = []
+        for _a,_b in zip(rgb_1,rgb_2):
+            _out_color.append( _a +(_b-_a)*alpha )
+        return tuple(_out_color)
+    _rgb_1 = np.asarray(rgb_1)
+    _rgb_2 = np.asarray(rgb_2)
+    return _rgb_1 +(_rgb_2-_rgb_1)*np.asarray(alpha)[...,np.newaxis]
+
+# ------------------------------------------------------------------------------
+
+def rgb_to_hex( rgb ):
+    """
+    This function converts RGB colors, with coordinates from zero to one, to
+    HEX strings.
+
+    :param rgb: a single RGB tuple or an (N,3) array.
+
+    :return: string with the HEX color or array of strings.
+    """
+    _rgb = np.clip((np.asarray(rgb, dtype=np.float64)*255.).astype(int), 0, 255)
+    _packed = (_rgb[...,0] << 16) | (_rgb[...,1] << 8) | _rgb[...,2]
+    if np.ndim(_packed) == 0:
+        return '#%06x' % int(_packed)
+    return np.char.mod('#%06x', _packed)
+
+# ------------------------------------------------------------------------------
+# sRGB to CIE XYZ conversion matrix and D65 reference white:
+
+_srgb_to_xyz = np.array([[0.4124564, 0.3575761, 0.1804375],
+                         [0.2126729, 0.7151522, 0.0721750],
+                         [0.0193339, 0.1191920, 0.9503041]])
+_d65_white = np.array([0.95047, 1.0, 1.08883])
+_xyz_to_srgb = np.linalg.inv(_srgb_to_xyz)
+
+# ------------------------------------------------------------------------------
+
+def rgb_to_lab( rgb ):
     """
-    _out_color = []
-    for _a,_b in zip(rgb_1,rgb_2):
-        _out_color.append( _a +(_b-_a)*alpha )
-    return tuple(_out_color)
+    This function converts sRGB colors, with coordinates from zero to one, to
+    the CIE Lab color space (D65 white point).
+
+    :param rgb: (...,3) array of sRGB colors.
+
+    :return: (...,3) array of Lab colors.
+    """
+    _rgb = np.asarray(rgb, dtype=np.float64)
+    _lin = np.where(_rgb <= 0.04045, _rgb/12.92, ((_rgb+0.055)/1.055)**2.4)
+    _xyz = np.dot(_lin, _srgb_to_xyz.T)/_d65_white
+    _f = np.where(_xyz > (6./29.)**3, np.cbrt(_xyz), _xyz/(3.*(6./29.)**2)+4./29.)
+    return np.stack([ 116.*_f[...,1]-16.,
+                      500.*(_f[...,0]-_f[...,1]),
+                      200.*(_f[...,1]-_f[...,2]) ], axis=-1)
+
+# ------------------------------------------------------------------------------
+
+def lab_to_rgb( lab ):
+    """
+    This function converts CIE Lab colors (D65 white point) to sRGB colors,
+    clipped to the zero to one range.
+
+    :param lab: (...,3) array of Lab colors.
+
+    :return: (...,3) array of sRGB colors.
+    """
+    _lab = np.asarray(lab, dtype=np.float64)
+    _fy = (_lab[...,0]+16.)/116.
+    _f = np.stack([ _fy+_lab[...,1]/500., _fy, _fy-_lab[...,2]/200. ], axis=-1)
+    _xyz = np.where(_f > 6./29., _f**3, 3.*(6./29.)**2*(_f-4./29.))*_d65_white
+    _lin = np.clip(np.dot(_xyz, _xyz_to_srgb.T), 0., 1.)
+    _rgb = np.where(_lin <= 0.0031308, 12.92*_lin, 1.055*_lin**(1./2.4)-0.055)
+    return np.clip(_rgb, 0., 1.)
+
+# ------------------------------------------------------------------------------
+
+def color_lab_interpolation( rgb_1, rgb_2, alpha ):
+    """
+    This function performs a linear color interpolation in CIE Lab space,
+    that is perceptually uniform. Same conventions of
+    :func:`color_linear_interpolation`, returns an array.
+    """
+    return lab_to_rgb(color_linear_interpolation(rgb_to_lab(rgb_1), rgb_to_lab(rgb_2), alpha))
+
+# ------------------------------------------------------------------------------
+
+def color_cubic_interpolation( rgb_0, rgb_1, rgb_2, rgb_3, alpha ):
+    """
+    This function performs a cubic (Catmull-Rom) color interpolation in RGB
+    space between rgb_1 and rgb_2, using the neighbouring colors rgb_0 and
+    rgb_3 to get a smooth transition. Colors are clipped to the zero to one
+    range. Same conventions of :func:`color_linear_interpolation`, returns an
+    array.
+    """
+    _p0, _p1, _p2, _p3 = [ np.asarray(_c, dtype=np.float64) for _c in (rgb_0, rgb_1, rgb_2, rgb_3) ]
+    _t = np.asarray(alpha, dtype=np.float64)[...,np.newaxis]
+    _out = 0.5*( 2.*_p1 +(-_p0+_p2)*_t
+                 +(2.*_p0-5.*_p1+4.*_p2-_p3)*_t**2
+                 +(-_p0+3.*_p1-3.*_p2+_p3)*_t**3 )
+    return np.clip(_out, 0., 1.)
+
+# ------------------------------------------------------------------------------
+
+interpolation_methods = ['linear', 'lab', 'cubic']
+
+lut_resolution = 256 #: number of table entries between two colors of a colormap.
+
+_colormap_tables = {}
+
+def colormap_table( colormap='the_gold_standard', interpolation_method='lab' ):
+    """
+    This function returns the lookup table of a colormap for a given
+    interpolation method: lut_resolution colors for every color of the map,
+    going once around the (cyclic) colormap. Tables are computed only once.
+
+    :param colormap: a string containing the name of the colormap.
+    :type colormap: :class:`string`
+    :param interpolation_method: one of interpolation_methods.
+    :type interpolation_method: :class:`string`
+
+    :return: (len(colormap)*lut_resolution,3) array of RGB colors.
+    """
+    _key = (str(colormap), str(interpolation_method))
+    if _key in _colormap_tables:
+        return _colormap_tables[_key]
+    try:
+        _cmap = _colormap_arrays[str(colormap)]
+    except KeyError:
+        raise ValueError('Requested color map ('+str(colormap)+') does not exist.')
+    _n = len(_cmap)
+    _pos = np.arange(_n*lut_resolution)/float(lut_resolution)
+    _idx = np.floor(_pos).astype(int)
+    _t = _pos-_idx
+    if interpolation_method=='linear':
+        _table = color_linear_interpolation(_cmap[_idx], _cmap[(_idx+1)%_n], _t)
+    elif interpolation_method=='lab':
+        _table = color_lab_interpolation(_cmap[_idx], _cmap[(_idx+1)%_n], _t)
+    elif interpolation_method=='cubic':
+        _table = color_cubic_interpolation(_cmap[(_idx-1)%_n], _cmap[_idx],
+                                           _cmap[(_idx+1)%_n], _cmap[(_idx+2)%_n], _t)
+    else:
+        raise ValueError('Requested color interpolation method ('+str(interpolation_method)+') does not exist.')
+    _table.setflags(write=False)
+    _colormap_tables[_key] = _table
+    return _table
+
+# ------------------------------------------------------------------------------
+
+def matplotlib_colormap( colormap='the_gold_standard', interpolation_method='lab', cyclic=False ):
+    """
+    This function returns one of the colormaps defined above as a matplotlib
+    colormap, built from the lookup table of :func:`colormap_table`.
+
+    :param colormap: a string containing the name of the colormap.
+    :type colormap: :class:`string`
+    :param interpolation_method: one of interpolation_methods.
+    :type interpolation_method: :class:`string`
+    :param cyclic: if True the colormap goes back from the last color to the
+        first one, otherwise it goes from the first color to the last one.
+    :type cyclic: :class:`bool`
+
+    :return: :class:`matplotlib.colors.ListedColormap`
+    """
+    import matplotlib.colors as mcolors
+    _table = colormap_table(colormap, interpolation_method)
+    if not cyclic:
+        _table = _table[:(len(_colormap_arrays[str(colormap)])-1)*lut_resolution+1]
+    return mcolors.ListedColormap(_table, name=str(colormap)+'_'+str(interpolation_method))
 
 # ******************************************************************************
 # definition of the color helper:
@@ -116,11 +290,12 @@ def nice_colors( num, colormap='the_gold_standard', interpolation_method='linear
     This function returns a color from a colormap defined above, according to the
     number entered.
 
-    :param num: input number. Can be an integer or float.
+    :param num: input number. Can be an integer or float, or an array of them.
         If the number is integer the function returns one of the colors in the
         colormap. If the number is a float returns the shade combining the two
-        neighbouring colors.
-    :type num: :class:`int` or :class:`float`
+        neighbouring colors. If an array is given all the colors are computed
+        at once.
+    :type num: :class:`int` or :class:`float` or :class:`numpy.ndarray`
 
     :param colormap: a string containing the name of the colormap.
     :type colormap: :class:`string`
@@ -128,7 +303,10 @@ def nice_colors( num, colormap='the_gold_standard', interpolation_method='linear
     :param interpolation_method: the method to interpolate between colors.
         Legal choices are:
             interpolation_method='linear', linear interpolation;
-        Further interpolation methods will be added in the future.
+            interpolation_method='lab', linear interpolation in CIE Lab space;
+            interpolation_method='cubic', smooth cubic interpolation.
+        The 'lab' and 'cubic' colors are read from the precomputed tables of
+        :func:`colormap_table`.
     :type interpolation_method: :class:`string`
 
     :param output_format: output format of the color.
@@ -137,29 +315,37 @@ def nice_colors( num, colormap='the_gold_standard', interpolation_method='linear
             output_format='RGB' (default)
     :type output_format: :class:`string`
 
-    :return: string with HEX color or tuple with RGB coordinates
+    :return: string with HEX color or tuple with RGB coordinates.
+        For array input an array of HEX strings or an (N,3) array of RGB
+        coordinates, with the shape of num.
 
     """
     # get the colormap:
     try:
-        _cmap = globals()[str(colormap)]
-    except:
+        _cmap = _colormap_arrays[str(colormap)]
+    except KeyError:
         raise ValueError('Requested color map ('+str(colormap)+') does not exist.')
+    _scalar = np.ndim(num) == 0
+    _num = np.asarray(num, dtype=np.float64)
     # get the indexes of the color map:
-    _idx_low = int( math.floor(num%len(_cmap)) )
-    _idx_up  = int( math.floor((_idx_low+1)%len(_cmap)) )
+    _pos = np.mod(_num, len(_cmap))
+    _idx_low = np.floor(_pos).astype(int)
+    _idx_up  = (_idx_low+1) % len(_cmap)
     # perform color interpolation:
     if interpolation_method=='linear':
-        _t = num%len(_cmap)-_idx_low
+        _t = _pos-_idx_low
         _out_color = color_linear_interpolation(_cmap[_idx_low],_cmap[_idx_up],_t)
+    elif interpolation_method in interpolation_methods:
+        _table = colormap_table(colormap, interpolation_method)
+        _out_color = _table[ np.rint(_pos*lut_resolution).astype(int) % len(_table) ]
     else:
         raise ValueError('Requested color interpolation method ('+str(interpolation_method)+') does not exist.')
     # choose the output format:
     if output_format=='HEX':
-        _out_color = '#%02x%02x%02x' % tuple( [ _c*255. for _c in _out_color] )
-        _out_color = str(_out_color)
+        _out_color = rgb_to_hex(_out_color)
     elif output_format=='RGB':
-        pass
+        if _scalar:
+            _out_color = tuple( float(_c) for _c in _out_color )
     else:
         raise ValueError('Requested output format ('+str(output_format)+') does not exist.')
     #
@@ -0,0 +1,524 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing utilities to read the results of the sampler runs.
+
+The evidence results of full runs are parsed from the MultiNest stats.dat
+files found under chains/, with the setting of each run (efficiency) read
+from its file name. The samplers with no stats file (e.g. the PolyChord
+repeats runs, whose chains are not shipped) are read from the published
+values in data/published_evidences.csv.
+
+The evidence results of repeated runs (one text file per sampler setting,
+one row per seed) are packed in a single binary table, sorted by sampler,
+setting and seed. The table is stored in the cache, keyed by the content of
+the source files, and memory mapped, so that a whole grid of runs (or any
+slice of it) is read with a few binary searches and one contiguous read.
+
+"""
+
+# ******************************************************************************
+
+import os
+import re
+import glob
+import json
+import numpy as np
+
+import cache_utilities as cache
+
+# ******************************************************************************
+# definition of the run sources:
+
+# record of one run in the run table:
+run_dtype = np.dtype([('sampler', 'S16'),
+                      ('setting', np.float64),
+                      ('seed', np.int32),
+                      ('logz', np.float64),
+                      ('dlogz', np.float64),
+                      ])
+
+# runs on the Gaussian likelihood: file pattern, prefix of the setting in the
+# file name and samplers whose (logz, dlogz) column pairs are in the files.
+gaussian_runs = [
+                 ('data/eff*.csv', 'eff', ['multinest', 'multinest_ins']),
+                 ('data/nr*.csv', 'nr', ['polychord']),
+                 ]
+
+# ------------------------------------------------------------------------------
+
+def run_files( sources=gaussian_runs, folder='.' ):
+    """
+    This function returns the files of the given run sources, together with
+    the value of the setting encoded in their name (e.g. data/eff0.3.csv has
+    setting 0.3).
+
+    :param sources: list of (pattern, prefix, samplers) tuples.
+    :type sources: :class:`list`
+    :param folder: folder the patterns are relative to.
+    :type folder: :class:`string`
+
+    :return: list of (file, setting, samplers) tuples.
+    """
+    _files = []
+    for _pattern, _prefix, _samplers in sources:
+        for _file in sorted(glob.glob(os.path.join(folder, _pattern))):
+            _stem = os.path.splitext(os.path.basename(_file))[0]
+            _match = re.match(re.escape(_prefix)+r'([-+0-9.eE]+)$', _stem)
+            if _match is None:
+                continue
+            _files.append((_file, float(_match.group(1)), _samplers))
+    return _files
+
+# ------------------------------------------------------------------------------
+
+def ingest_runs( files ):
+    """
+    This function reads the run files and packs all the runs in a single
+    table of :data:`run_dtype` records, sorted by sampler, setting and seed.
+    The seed of a run is its row in the file.
+
+    :param files: list of (file, setting, samplers) tuples, see :func:`run_files`.
+    :type files: :class:`list`
+
+    :return: structured array with the runs.
+    """
+    _blocks = []
+    for _file, _setting, _samplers in files:
+        _data = np.atleast_2d(np.loadtxt(_file, delimiter=','))
+        if _data.shape[1] < 2*len(_samplers):
+            raise ValueError('Expected '+str(2*len(_samplers))+' columns in '+_file)
+        for _i, _sampler in enumerate(_samplers):
+            _block = np.zeros(len(_data), dtype=run_dtype)
+            _block['sampler'] = _sampler
+            _block['setting'] = _setting
+            _block['seed'] = np.arange(len(_data))
+            _block['logz'] = _data[:, 2*_i]
+            _block['dlogz'] = _data[:, 2*_i+1]
+            _blocks.append(_block)
+    if len(_blocks) == 0:
+        return np.zeros(0, dtype=run_dtype)
+    return _sort_runs(np.concatenate(_blocks))
+
+# ------------------------------------------------------------------------------
+
+def _sort_runs( table ):
+    """
+    Returns the run table sorted by sampler, setting and seed.
+    """
+    return table[np.lexsort((table['seed'], table['setting'], table['sampler']))]
+
+# ------------------------------------------------------------------------------
+
+def load_runs( sources=gaussian_runs, folder='.', use_cache=True ):
+    """
+    This function returns the table of all the runs of the given sources.
+    The table is built from the text files only when they change, otherwise
+    it is memory mapped from the cache.
+
+    :param sources: list of (pattern, prefix, samplers) tuples.
+    :type sources: :class:`list`
+    :param folder: folder the patterns are relative to.
+    :type folder: :class:`string`
+    :param use_cache: if False read the text files directly.
+    :type use_cache: :class:`bool`
+
+    :return: structured array of :data:`run_dtype` records.
+    """
+    _files = run_files(sources, folder)
+    if not use_cache:
+        return ingest_runs(_files)
+    _digest = cache.files_digest([ _f[0] for _f in _files ], extra=repr(sources))
+    _cache_file = os.path.join(cache.cache_folder('runs'), 'runs_'+_digest[:16]+'.npy')
+    if not os.path.exists(_cache_file):
+        _table = ingest_runs(_files)
+        _temp = cache.temporary_name(_cache_file)
+        with open(_temp, 'wb') as _file:
+            np.save(_file, _table)
+        os.replace(_temp, _cache_file)
+    return np.load(_cache_file, mmap_mode='r')
+
+# ******************************************************************************
+# definition of the sampler stats parsers:
+
+# stats files of the full runs: file pattern, regular expression extracting
+# the setting from the file name and format of the file. Both are anchored on
+# the whole run root, so that other runs with the same prefix (e.g. the
+# mn-eff03-omp1-tol001_d3y1_w_ tolerance runs) are not taken as seeds.
+# The stats files of the PolyChord repeats runs are not part of the
+# repository, pass their sources to load_stats (format 'polychord').
+stats_runs = [
+              ('chains/mn-eff*-omp1_d3y1_w_stats.dat', r'^mn-eff([0-9e]+)-omp1_d3y1_w_stats\.dat$', 'multinest'),
+              ]
+
+# published evidences of the full runs, used for the samplers with no stats
+# files:
+published_evidences = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'published_evidences.csv')
+
+_number = r'([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)'
+
+# ------------------------------------------------------------------------------
+
+def setting_from_tag( tag ):
+    """
+    This function converts the setting encoded in a run name to a number:
+    leading zeros are decimals and a trailing e is a negative power of ten,
+    as in the chain names (1 -> 1, 03 -> 0.3, 001 -> 0.01, 1e3 -> 0.001).
+
+    :param tag: the encoded setting.
+    :type tag: :class:`string`
+
+    :return: float with the setting.
+    """
+    if 'e' in tag:
+        _mantissa, _exponent = tag.split('e')
+        return float(_mantissa)*10.**(-int(_exponent))
+    if len(tag) > 1 and tag.startswith('0'):
+        return float('0.'+tag[1:])
+    return float(tag)
+
+# ------------------------------------------------------------------------------
+
+def parse_multinest_stats( stats_file ):
+    """
+    This function reads the global evidences of a MultiNest stats.dat file.
+
+    :param stats_file: path of the root_stats.dat file.
+    :type stats_file: :class:`string`
+
+    :return: dictionary with the (logz, dlogz) tuples of the nested sampling
+        (key 'multinest') and, if present, of the importance nested sampling
+        (key 'multinest_ins') evidence.
+    """
+    with open(stats_file) as _file:
+        _text = _file.read()
+    _results = {}
+    for _key, _label in [('multinest', r'Nested Sampling Global Log-Evidence'),
+                         ('multinest_ins', r'Nested Importance Sampling Global Log-Evidence'),
+                         ]:
+        _match = re.search(_label+r'\s*:\s*'+_number+r'\s*\+/-\s*'+_number, _text)
+        if _match is not None:
+            _results[_key] = tuple( float(_v) for _v in _match.groups() )
+    # old versions only report the nested sampling evidence:
+    if 'multinest' not in _results:
+        _match = re.search(r'Global Log-Evidence\s*:\s*'+_number+r'\s*\+/-\s*'+_number, _text)
+        if _match is not None:
+            _results['multinest'] = tuple( float(_v) for _v in _match.groups() )
+    if len(_results) == 0:
+        raise ValueError('No evidence found in '+str(stats_file))
+    return _results
+
+# ------------------------------------------------------------------------------
+
+def parse_polychord_stats( stats_file ):
+    """
+    This function reads the global evidence of a PolyChord .stats file.
+
+    :param stats_file: path of the root.stats file.
+    :type stats_file: :class:`string`
+
+    :return: dictionary with the (logz, dlogz) tuple of the evidence (key
+        'polychord').
+    """
+    with open(stats_file) as _file:
+        _text = _file.read()
+    _match = re.search(r'log\(Z\)\s*=\s*'+_number+r'\s*\+/-\s*'+_number, _text)
+    if _match is None:
+        raise ValueError('No evidence found in '+str(stats_file))
+    return {'polychord': tuple( float(_v) for _v in _match.groups() )}
+
+# ------------------------------------------------------------------------------
+
+stats_parsers = {'multinest': parse_multinest_stats,
+                 'polychord': parse_polychord_stats,
+                 }
+
+# ------------------------------------------------------------------------------
+
+def load_published( published_file=published_evidences ):
+    """
+    This function reads a table of published evidences, a csv file with
+    sampler, setting, logz and dlogz columns (lines starting with # are
+    comments), as a run table with one seed per setting.
+
+    :param published_file: path of the csv file.
+    :type published_file: :class:`string`
+
+    :return: structured array of :data:`run_dtype` records.
+    """
+    import csv
+    with open(published_file) as _file:
+        _rows = list(csv.DictReader( _l for _l in _file if not _l.lstrip().startswith('#') ))
+    _table = np.zeros(len(_rows), dtype=run_dtype)
+    for _i, _row in enumerate(_rows):
+        _table[_i] = (_row['sampler'].strip(), float(_row['setting']), 0,
+                      float(_row['logz']), float(_row['dlogz']))
+    return _sort_runs(_table)
+
+# ------------------------------------------------------------------------------
+
+def load_stats( sources=stats_runs, folder='.', published_file=published_evidences ):
+    """
+    This function parses the stats files of all the runs of the given sources
+    and returns them as a run table (see :func:`load_runs`), with one record
+    per run and evidence kind. Runs with the same setting are numbered as
+    seeds in file name order. The samplers with no stats file are taken
+    from the published evidences, see :func:`load_published`.
+
+    The results are cached, keyed by the content of each file, so that only
+    new or changed files are parsed.
+
+    :param sources: list of (pattern, regular expression, format) tuples.
+    :type sources: :class:`list`
+    :param folder: folder the patterns are relative to.
+    :type folder: :class:`string`
+    :param published_file: csv file of the published evidences, None to use
+        the stats files only.
+    :type published_file: :class:`string`
+
+    :return: structured array of :data:`run_dtype` records.
+    """
+    _files = []
+    for _pattern, _regex, _format in sources:
+        for _file in sorted(glob.glob(os.path.join(folder, _pattern))):
+            _match = re.search(_regex, os.path.basename(_file))
+            if _match is not None:
+                _files.append((_file, setting_from_tag(_match.group(1)), _format))
+    # cached results, keyed by the digest of the file:
+    _cache_file = os.path.join(cache.cache_folder('runs'), 'stats.json')
+    _parsed = {}
+    if os.path.exists(_cache_file):
+        with open(_cache_file) as _file:
+            _parsed = json.load(_file)
+    _digests = [ cache.file_digest(_f[0]) for _f in _files ]
+    _todo = [ (_f, _d) for _f, _d in zip(_files, _digests) if _d not in _parsed ]
+    if len(_todo) > 0:
+        for (_file, _, _format), _digest in _todo:
+            _parsed[_digest] = stats_parsers[_format](_file)
+        _temp = cache.temporary_name(_cache_file)
+        with open(_temp, 'w') as _file:
+            json.dump(_parsed, _file)
+        os.replace(_temp, _cache_file)
+    # build the table:
+    _table = np.zeros(sum( len(_parsed[_d]) for _d in _digests ), dtype=run_dtype)
+    _seeds = {}
+    _i = 0
+    for (_file, _setting, _), _digest in zip(_files, _digests):
+        for _sampler, (_logz, _dlogz) in sorted(_parsed[_digest].items()):
+            _seed = _seeds.get((_sampler, _setting), 0)
+            _seeds[(_sampler, _setting)] = _seed+1
+            _table[_i] = (_sampler, _setting, _seed, _logz, _dlogz)
+            _i += 1
+    # published values of the samplers with no stats file:
+    if published_file is not None:
+        _published = load_published(published_file)
+        _published = _published[~np.isin(_published['sampler'], _table['sampler'])]
+        _table = np.concatenate([_table, _published])
+    return _sort_runs(_table)
+
+# ******************************************************************************
+# definition of the dead point readers:
+
+def multinest_dead_points( file_root, nlive=None ):
+    """
+    This function reads the dead points of a MultiNest run (root_ev.dat)
+    followed by its final live points (root_phys_live.points), as needed
+    to recompute the evidence, see statistics_utilities.nested_evidence.
+
+    :param file_root: root of the run, e.g. chains/mn-eff1-omp1_d3y1_w_.
+    :type file_root: :class:`string`
+    :param nlive: number of live points of the run. Defaults to the number
+        of final live points.
+    :type nlive: :class:`int`
+
+    :return: tuple with the increasing log-likelihoods and the number of
+        live points at each death.
+    """
+    import chain_utilities as chu
+    # ev.dat columns: parameters, logL, log prior volume, mode:
+    _logl_dead = np.asarray(chu.load_column(file_root+'ev.dat', -3))
+    # phys_live.points columns: parameters, logL, mode:
+    _logl_live = np.sort(np.asarray(chu.load_column(file_root+'phys_live.points', -2)))
+    if nlive is None:
+        nlive = len(_logl_live)
+    _logl = np.concatenate([_logl_dead, _logl_live])
+    _nlive = np.concatenate([np.full(len(_logl_dead), nlive),
+                             np.arange(len(_logl_live), 0, -1)])
+    return _logl, _nlive
+
+# ------------------------------------------------------------------------------
+
+def polychord_dead_points( file_root ):
+    """
+    This function reads the dead points of a PolyChord run from its
+    dead-birth file (root_dead-birth.txt), which includes the final live
+    points, and counts the live points at each death from the birth contours.
+
+    :param file_root: root of the run.
+    :type file_root: :class:`string`
+
+    :return: tuple with the increasing log-likelihoods and the number of
+        live points at each death.
+    """
+    import chain_utilities as chu
+    import statistics_utilities as su
+    _logl, _birth = chu.load_columns(file_root+'_dead-birth.txt', [-2, -1])
+    _logl = np.sort(np.asarray(_logl), kind='stable')
+    return _logl, su.live_point_counts(_logl, _birth)
+
+# ------------------------------------------------------------------------------
+
+# dead point files of the full runs, as stats_runs: file pattern, regular
+# expression extracting the root and the setting, and reader of the file.
+# The evidences recomputed from them are named after the sampler, with a
+# _dead suffix. PolyChord dead-birth files are read with format 'polychord'.
+dead_point_runs = [
+                   ('chains/mn-eff*-omp1_d3y1_w_ev.dat', r'^(mn-eff([0-9e]+)-omp1_d3y1_w_)ev\.dat$', 'multinest'),
+                   ]
+
+dead_point_readers = {'multinest': multinest_dead_points,
+                      'polychord': polychord_dead_points,
+                      }
+
+# ------------------------------------------------------------------------------
+
+def recompute_evidences( sources=dead_point_runs, folder='.', num_samples=1000, seed=0 ):
+    """
+    This function recomputes the evidence of all the runs of the given
+    sources from their dead points, with an error bar from simulated prior
+    volume shrinkages (see statistics_utilities.nested_evidence), and returns
+    them as a run table, with one record per run, independent of the
+    sampler's own estimates. Runs with the same setting are numbered as
+    seeds in file name order.
+
+    The results are cached, keyed by the content of the files of each run
+    and the number of simulated runs.
+
+    :param sources: list of (pattern, regular expression, format) tuples.
+    :type sources: :class:`list`
+    :param folder: folder the patterns are relative to.
+    :type folder: :class:`string`
+    :param num_samples: number of simulated runs of the error bars.
+    :type num_samples: :class:`int`
+    :param seed: seed of the random number generator.
+
+    :return: structured array of :data:`run_dtype` records.
+    """
+    import statistics_utilities as su
+    _runs = []
+    for _pattern, _regex, _format in sources:
+        for _file in sorted(glob.glob(os.path.join(folder, _pattern))):
+            _match = re.search(_regex, os.path.basename(_file))
+            if _match is not None:
+                _root = os.path.join(os.path.dirname(_file), _match.group(1))
+                _files = [_file]+([_root+'phys_live.points'] if _format == 'multinest' else [])
+                _runs.append((_root, setting_from_tag(_match.group(2)), _format,
+                              cache.files_digest(_files, extra=(num_samples, seed))))
+    # cached results, keyed by the digest of the files:
+    _cache_file = os.path.join(cache.cache_folder('runs'), 'evidences.json')
+    _computed = {}
+    if os.path.exists(_cache_file):
+        with open(_cache_file) as _file:
+            _computed = json.load(_file)
+    _todo = [ _r for _r in _runs if _r[3] not in _computed ]
+    for _root, _, _format, _digest in _todo:
+        _logl, _nlive = dead_point_readers[_format](_root)
+        _computed[_digest] = su.nested_evidence(_logl, _nlive, num_samples=num_samples, seed=seed)
+    if len(_todo) > 0:
+        _temp = cache.temporary_name(_cache_file)
+        with open(_temp, 'w') as _file:
+            json.dump(_computed, _file)
+        os.replace(_temp, _cache_file)
+    # build the table:
+    _table = np.zeros(len(_runs), dtype=run_dtype)
+    _seeds = {}
+    for _i, (_, _setting, _format, _digest) in enumerate(_runs):
+        _sampler = _format+'_dead'
+        _seed = _seeds.get((_sampler, _setting), 0)
+        _seeds[(_sampler, _setting)] = _seed+1
+        _table[_i] = (_sampler, _setting, _seed)+tuple(_computed[_digest])
+    return _sort_runs(_table)
+
+# ******************************************************************************
+# definition of the grid selection:
+
+def _block( column, value, start=0, stop=None ):
+    """
+    Returns the range of rows, between start and stop, where a sorted column
+    is equal to value.
+    """
+    _stop = len(column) if stop is None else stop
+    _column = column[start:_stop]
+    return start+np.searchsorted(_column, value, side='left'), \
+           start+np.searchsorted(_column, value, side='right')
+
+# ------------------------------------------------------------------------------
+
+def run_grid( table, sampler, settings=None, seeds=None ):
+    """
+    This function returns the grid of results of one sampler, one row per
+    setting and one column per seed.
+
+    :param table: run table, see :func:`load_runs`.
+    :param sampler: name of the sampler.
+    :type sampler: :class:`string`
+    :param settings: settings to return, in this order. Defaults to all the
+        settings of the sampler, sorted.
+    :type settings: :class:`list`
+    :param seeds: slice or array of seed indexes to return. Defaults to all.
+
+    :return: tuple with the settings, the logz and the dlogz grids. Missing
+        runs are filled with NaN.
+    """
+    _start, _stop = _block(table['sampler'], sampler.encode())
+    if _start == _stop:
+        raise ValueError('No runs of sampler '+str(sampler))
+    _runs = np.asarray(table[_start:_stop])
+    if settings is None:
+        _settings = np.unique(_runs['setting'])
+    else:
+        _settings = np.asarray(settings, dtype=np.float64)
+    _ranges = [ _block(_runs['setting'], _s) for _s in _settings ]
+    for _s, (_a, _b) in zip(_settings, _ranges):
+        if _a == _b:
+            raise ValueError('No runs of sampler '+str(sampler)+' with setting '+str(_s))
+    _num_seeds = np.max(_runs['seed'])+1
+    _logz = np.full((len(_settings), _num_seeds), np.nan)
+    _dlogz = np.full((len(_settings), _num_seeds), np.nan)
+    for _i, (_a, _b) in enumerate(_ranges):
+        _logz[_i, _runs['seed'][_a:_b]] = _runs['logz'][_a:_b]
+        _dlogz[_i, _runs['seed'][_a:_b]] = _runs['dlogz'][_a:_b]
+    if seeds is not None:
+        _logz, _dlogz = _logz[:, seeds], _dlogz[:, seeds]
+    return _settings, _logz, _dlogz
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Summary of the evidence tables.')
+    parser.add_argument('--recompute', action='store_true',
+                        help='compare the evidences of the stats files with those recomputed from the dead points')
+    args = parser.parse_args()
+    folder = os.path.dirname(os.path.abspath(__file__))
+
+    if args.recompute:
+        reported, recomputed = load_stats(folder=folder), recompute_evidences(folder=folder)
+        for sampler in [ _s.decode()[:-len('_dead')] for _s in np.unique(recomputed['sampler']) ]:
+            settings, logz, dlogz = run_grid(reported, sampler, seeds=0)
+            settings_dead, logz_dead, dlogz_dead = run_grid(recomputed, sampler+'_dead', seeds=0)
+            for _s, _z, _dz in zip(settings_dead, logz_dead, dlogz_dead):
+                _z_reported, _dz_reported = np.nan, np.nan
+                if _s in settings:
+                    _j = list(settings).index(_s)
+                    _z_reported, _dz_reported = logz[_j], dlogz[_j]
+                print('%s %g: reported %.3f +/- %.3f, recomputed %.3f +/- %.3f'
+                      % (sampler, _s, _z_reported, _dz_reported, _z, _dz))
+    else:
+        # ingest the runs and print a summary of the table:
+        table = load_runs(folder=folder)
+        for sampler in np.unique(table['sampler']):
+            settings, logz, _ = run_grid(table, sampler.decode())
+            print('%s: %d settings x %d seeds' % (sampler.decode(), logz.shape[0], logz.shape[1]))
@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing utilities to work with getdist chains.
+
+Text chains are parsed once and stored in a binary cache (see
+cache_utilities), keyed by the content of the chain files, so that
+re-rendering a figure does not pay the text parse again. The same applies to
+the 1D and 2D marginalized densities (and their contour levels), see
+:func:`cache_densities`.
+
+"""
+
+# ******************************************************************************
+
+import os
+import pickle
+import logging
+import hashlib
+import collections
+import numpy as np
+import getdist
+import getdist.chains as gchains
+import getdist.mcsamples as mcsamples
+import getdist.paramnames as gparamnames
+
+import cache_utilities as cache
+
+# ******************************************************************************
+# definition of the chain loading utilities:
+
+_loaded_chains = collections.OrderedDict() # chains already loaded by this process, see load_chain.
+max_loaded_chains = 8 #: number of chains kept in memory by a process.
+
+# ------------------------------------------------------------------------------
+
+def chain_files( file_root ):
+    """
+    This function returns the text files of the chain with the given root,
+    following the getdist naming conventions (root.txt, root_1.txt, ...).
+
+    :param file_root: root of the chain (without extension).
+    :type file_root: :class:`string`
+
+    :return: list of file names.
+    """
+    _files = gchains.chainFiles(file_root)
+    if not _files:
+        _files = gchains.chainFiles(file_root, separator='.')
+    return _files
+
+# ------------------------------------------------------------------------------
+
+def chain_digest( file_root ):
+    """
+    This function returns the digest of all the files defining a chain: the
+    text chains and the parameter names and ranges files.
+
+    :param file_root: root of the chain (without extension).
+    :type file_root: :class:`string`
+
+    :return: string with the hexadecimal digest.
+    """
+    _files = chain_files(file_root)
+    if not _files:
+        raise IOError('No chains found: '+str(file_root))
+    return cache.files_digest(_files+[file_root+'.paramnames', file_root+'.ranges'])
+
+# ------------------------------------------------------------------------------
+
+def _read_chain_columns( file_root, cache_file ):
+    """
+    Returns the list of column arrays of the text chains of a root, from the
+    binary cache if present, otherwise parsing the text and filling the cache.
+    """
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as _data:
+            return [ _data['chain_'+str(_i)] for _i in range(int(_data['num_chains'])) ]
+    _columns = []
+    for _file in chain_files(file_root):
+        _cols = gchains.loadNumpyTxt(_file)
+        if _cols is not None and len(_cols):
+            _columns.append(np.atleast_2d(_cols))
+    if len(_columns) == 0:
+        raise IOError('No chains found: '+str(file_root))
+    _arrays = { 'chain_'+str(_i): _c for _i, _c in enumerate(_columns) }
+    _arrays['num_chains'] = len(_columns)
+    if os.path.exists(file_root+'.paramnames'):
+        _arrays['names'] = np.array(gparamnames.ParamNames(file_root+'.paramnames').list())
+    _temp = cache.temporary_name(cache_file)
+    with open(_temp, 'wb') as _file:
+        np.savez(_file, **_arrays)
+    os.replace(_temp, cache_file)
+    return _columns
+
+# ------------------------------------------------------------------------------
+
+def _prune_chain_columns( columns, tolerance, method ):
+    """
+    Prunes the negligible weights of the column arrays of the chains of a
+    root, with a tolerance relative to the total weight of all the chains.
+    Returns the pruned columns and the neglected mass.
+    """
+    import chain_utilities as chu
+    _sizes = np.cumsum([0]+[ len(_c) for _c in columns ])
+    _keep, _weights, _mass = chu.prune_weights(np.concatenate([ _c[:, 0] for _c in columns ]),
+                                               tolerance, method)
+    _pruned = []
+    for _i, _c in enumerate(columns):
+        _in = (_keep >= _sizes[_i]) & (_keep < _sizes[_i+1])
+        _cols = _c[_keep[_in]-_sizes[_i]]
+        _cols[:, 0] = _weights[_in]
+        _pruned.append(_cols)
+    return _pruned, _mass
+
+# ------------------------------------------------------------------------------
+
+def _remove_burn_in( columns, ignore_lines, ignore_frac ):
+    """
+    Removes the burn in from the column arrays of the chains of a root as
+    getdist does: ignore_lines rows, or else the ignore_frac fraction of the
+    rows, from the start of each chain.
+    """
+    _removed = []
+    for _c in columns:
+        _rows = int(ignore_lines) if ignore_lines else int(round(len(_c)*ignore_frac))
+        _removed.append(_c[_rows:])
+    return _removed
+
+# ------------------------------------------------------------------------------
+
+def load_chain( file_root, settings=None, use_cache=True, prune=None, prune_method='drop' ):
+    """
+    This function loads a chain as a getdist MCSamples, with the same result
+    of getdist.mcsamples.loadMCSamples. The text chains are parsed only the
+    first time, then samples, weights and log-likelihoods are read from the
+    binary cache.
+
+    :param file_root: root of the chain (without extension).
+    :type file_root: :class:`string`
+    :param settings: dictionary of getdist analysis settings.
+    :type settings: :class:`dict`
+    :param use_cache: if False parse the text chains directly (ignored when
+        pruning).
+    :type use_cache: :class:`bool`
+    :param prune: if given, neglect the samples with the smallest weights up
+        to this fraction of the total weight, after the removal of the burn
+        in (ignore_rows), see chain_utilities.prune_weights. The neglected
+        mass is stored in the pruned_mass attribute of the result.
+    :type prune: :class:`float`
+    :param prune_method: 'drop' or 'merge' the negligible samples.
+    :type prune_method: :class:`string`
+
+    :return: :class:`getdist.mcsamples.MCSamples` with the chain. The digest
+        of the chain files is stored in its chain_digest attribute and its
+        densities are cached, see :func:`cache_densities`.
+        Within a process the same chain, with the same settings, is loaded
+        only once (e.g. in the render server): the max_loaded_chains most
+        recently used chains are kept and the same object is returned to
+        all the callers, so it must not be modified. Older versions of a
+        chain are dropped as soon as its files change.
+    """
+    if not use_cache and prune is None:
+        return mcsamples.loadMCSamples(file_root, settings=settings, no_cache=True)
+    _digest = chain_digest(file_root)
+    _root = os.path.abspath(file_root)
+    _key = (_root, _digest, repr(sorted(settings.items())) if settings else None, prune, prune_method)
+    if _key in _loaded_chains:
+        _loaded_chains.move_to_end(_key)
+        return _loaded_chains[_key]
+    _cache_file = os.path.join(cache.cache_folder('chains'),
+                               os.path.basename(file_root)+'_'+_digest[:16]+'.npz')
+    _columns = _read_chain_columns(file_root, _cache_file)
+    # build the samples as loadMCSamples would do from the text files:
+    _samples = mcsamples.MCSamples(file_root, settings=settings)
+    if prune is not None:
+        # the burn in is removed first, so that it is the same rows getdist
+        # would remove, and the pruning tolerance is relative to what is left:
+        _columns = _remove_burn_in(_columns, _samples.ignore_lines, _samples.ignore_frac)
+        _samples.ignore_lines, _samples.ignore_frac = 0, 0.
+        _columns, _pruned_mass = _prune_chain_columns(_columns, prune, prune_method)
+    _samples.readChains([ _c[:, 2:] for _c in _columns ],
+                        weights=[ _c[:, 0] for _c in _columns ],
+                        loglikes=[ _c[:, 1] for _c in _columns ])
+    _samples.chain_digest = _digest
+    if prune is not None:
+        _samples.pruned_mass = _pruned_mass
+        logging.info('Pruned '+file_root+': kept '+str(sum( len(_c) for _c in _columns ))
+                     +' samples, neglected posterior mass %.2g' % _pruned_mass)
+    cache_densities(_samples)
+    # forget the previous versions of the chain and the least recently used:
+    for _old in [ _k for _k in _loaded_chains if _k[0] == _root and _k[1] != _digest ]:
+        del _loaded_chains[_old]
+    _loaded_chains[_key] = _samples
+    while len(_loaded_chains) > max_loaded_chains:
+        _loaded_chains.popitem(last=False)
+    return _samples
+
+# ******************************************************************************
+# definition of the density cache:
+
+# analysis settings that change the marginalized densities:
+density_settings = ['ignore_rows', 'range_ND_contour', 'range_confidence',
+                    'num_bins', 'fine_bins', 'num_bins_2D', 'fine_bins_2D',
+                    'smooth_scale_1D', 'smooth_scale_2D',
+                    'boundary_correction_order', 'mult_bias_correction_order',
+                    'max_corr_2D', 'use_effective_samples_2D', 'contours',
+                    'max_frac_twotail', 'force_twotail', 'credible_interval_threshold',
+                    ]
+
+# ------------------------------------------------------------------------------
+
+def density_key( samples, method, params, **kwargs ):
+    """
+    This function returns the cache key of a marginalized density: a digest
+    of the chain, of the values of the parameters (so that derived
+    parameters and removed burn-in are accounted for), of the analysis
+    settings and of the arguments of the getdist call.
+
+    :param samples: the chain.
+    :type samples: :class:`getdist.mcsamples.MCSamples`
+    :param method: name of the getdist method computing the density.
+    :type method: :class:`string`
+    :param params: names or indexes of the parameters.
+    :type params: :class:`list`
+    :param kwargs: other arguments of the getdist method.
+
+    :return: string with the hexadecimal digest.
+    """
+    _hash = hashlib.sha1()
+    _hash.update(repr((getdist.__version__, method, getattr(samples, 'chain_digest', None))).encode('utf-8'))
+    _hash.update(np.ascontiguousarray(samples.weights).tobytes())
+    for _param in params:
+        _index, _par = samples._parAndNumber(_param)
+        _hash.update(repr((_index, _par.name if _par is not None else None)).encode('utf-8'))
+        if _index is not None:
+            _hash.update(np.ascontiguousarray(samples.samples[:, _index]).tobytes())
+            _hash.update(repr((samples.ranges.getLower(_par.name), samples.ranges.getUpper(_par.name))).encode('utf-8'))
+    _settings = [ (_s, np.asarray(getattr(samples, _s, None)).tolist()) for _s in density_settings ]
+    _hash.update(repr((_settings, sorted(kwargs.items()))).encode('utf-8'))
+    return _hash.hexdigest()
+
+# ------------------------------------------------------------------------------
+
+def density_cache_file( samples, method, params, **kwargs ):
+    """
+    This function returns the cache file of a marginalized density, see
+    :func:`density_key` for the arguments.
+    """
+    _key = density_key(samples, method, params, **kwargs)
+    return os.path.join(cache.cache_folder('densities'),
+                        os.path.basename(samples.root or 'samples')+'_'+_key[:24]+'.pkl')
+
+# ------------------------------------------------------------------------------
+
+def _cached_density_method( samples, method, num_params ):
+    """
+    Returns a replacement of a getdist density method of samples that reads
+    the result from the cache, or computes and stores it.
+    """
+    _compute = getattr(samples, method)
+
+    def _cached(*args, **kwargs):
+        # prior masks and precomputed confidence data can not be keyed:
+        if kwargs.get('mask_function') is not None or kwargs.get('paramConfid') is not None \
+           or len(args) > num_params:
+            return _compute(*args, **kwargs)
+        _cache_file = density_cache_file(samples, method, args, **kwargs)
+        if os.path.exists(_cache_file):
+            with open(_cache_file, 'rb') as _file:
+                return pickle.load(_file)
+        _density = _compute(*args, **kwargs)
+        if _density is not None:
+            _temp = cache.temporary_name(_cache_file)
+            with open(_temp, 'wb') as _file:
+                pickle.dump(_density, _file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(_temp, _cache_file)
+        return _density
+
+    return _cached
+
+# ------------------------------------------------------------------------------
+
+def cache_densities( samples ):
+    """
+    This function makes the 1D and 2D marginalized densities of a chain,
+    as used by the getdist plots, come from an on-disk cache: they are
+    computed (with the kernel density estimate) only the first time for each
+    set of parameters, parameter values and analysis settings. Changing
+    fonts, colors or any other plot setting re-uses them.
+
+    :param samples: the chain, modified in place.
+    :type samples: :class:`getdist.mcsamples.MCSamples`
+
+    :return: the same chain.
+    """
+    if not getattr(samples, 'cached_densities', False):
+        samples.get1DDensityGridData = _cached_density_method(samples, 'get1DDensityGridData', 1)
+        samples.get2DDensityGridData = _cached_density_method(samples, 'get2DDensityGridData', 2)
+        samples.cached_densities = True
+    return samples
+
+# ------------------------------------------------------------------------------
+
+def _compute_densities( task ):
+    """
+    Worker of :func:`precompute_densities`: loads a chain (once per process,
+    see :func:`load_chain`) and computes a batch of its densities, that go to
+    the cache.
+    """
+    _root, _load_options, _densities = task
+    _samples = load_chain(_root, **_load_options)
+    for _method, _params, _kwargs in _densities:
+        getattr(_samples, _method)(*_params, **_kwargs)
+    return _root, len(_densities)
+
+# ------------------------------------------------------------------------------
+
+def _density_batches( missing, num_workers ):
+    """
+    Splits the missing densities of the chains, a list of (root, densities)
+    tuples, into about num_workers batches: each chain gets a number of
+    batches proportional to its missing densities, so that a worker loads a
+    chain once and computes a batch of its parameter pairs.
+    """
+    _total = sum( len(_d) for _, _d in missing )
+    _batches = []
+    for _root, _densities in missing:
+        _num = max(1, min(len(_densities), int(round(num_workers*len(_densities)/float(_total)))))
+        _batches += [ (_root, _densities[_i::_num]) for _i in range(_num) ]
+    return _batches
+
+# ------------------------------------------------------------------------------
+
+def precompute_densities( roots, params, settings=None, plot_settings=None, max_workers=None,
+                          prune=None, prune_method='drop' ):
+    """
+    This function computes all the densities that a getdist triangle plot of
+    the given chains and parameters needs: the 1D density of each parameter
+    and the 2D density of each pair, for each chain. Results go to the
+    density cache (see :func:`cache_densities`), so that the triangle plot
+    itself only draws them.
+
+    The cache is checked first and only the missing densities are computed,
+    in a pool of processes. The missing densities of each chain are split in
+    batches of parameter pairs, so that the work of a few chains spreads over
+    all the workers while each worker loads a chain once.
+
+    :param roots: list of chain roots.
+    :type roots: :class:`list`
+    :param params: list of parameter names, as given to triangle_plot.
+    :type params: :class:`list`
+    :param settings: dictionary of getdist analysis settings of the chains.
+    :type settings: :class:`dict`
+    :param plot_settings: settings of the plotter (number of contours and
+        mean likelihoods), defaults to the getdist ones.
+    :type plot_settings: :class:`getdist.plots.GetDistPlotSettings`
+    :param max_workers: number of worker processes. Defaults to the cores
+        given to the script by build_figures.py (SAMPLER_PLOTS_CORES) or to
+        all the cores. With one worker, or one batch, the densities are
+        computed in this process.
+    :type max_workers: :class:`int`
+    :param prune: weight pruning of the chains, see :func:`load_chain`.
+    :type prune: :class:`float`
+    :param prune_method: 'drop' or 'merge' the negligible samples.
+    :type prune_method: :class:`string`
+
+    :return: number of densities that were computed.
+    """
+    if plot_settings is None:
+        import getdist.plots as gplots
+        plot_settings = gplots.GetDistPlotSettings()
+    # same calls (and so same cache keys) as the getdist plotter:
+    _kwargs_1D = {'meanlikes': plot_settings.plot_meanlikes}
+    _kwargs_2D = {'num_plot_contours': plot_settings.num_plot_contours,
+                  'meanlikes': plot_settings.shade_meanlikes}
+    _load_options = {'settings': settings, 'prune': prune, 'prune_method': prune_method}
+    _densities = []
+    for _i, _param in enumerate(params):
+        _densities.append(('get1DDensityGridData', (_param,), _kwargs_1D))
+        for _param2 in params[_i+1:]:
+            _densities.append(('get2DDensityGridData', (_param, _param2), _kwargs_2D))
+    # missing densities of each chain (the chains are needed by the plot anyway):
+    _missing = []
+    for _root in roots:
+        _samples = load_chain(_root, **_load_options)
+        _chain_missing = [ _d for _d in _densities
+                           if not os.path.exists(density_cache_file(_samples, _d[0], _d[1], **_d[2])) ]
+        if len(_chain_missing) > 0:
+            _missing.append((_root, _chain_missing))
+    if len(_missing) == 0:
+        return 0
+    if max_workers is None:
+        max_workers = int(os.environ.get('SAMPLER_PLOTS_CORES', 0)) or os.cpu_count() or 1
+    _tasks = [ (_root, _load_options, _batch) for _root, _batch in _density_batches(_missing, max_workers) ]
+    if len(_tasks) == 1 or max_workers == 1:
+        _results = [ _compute_densities(_t) for _t in _tasks ]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(len(_tasks), max_workers)) as _executor:
+            _results = list(_executor.map(_compute_densities, _tasks))
+    return sum( _r[1] for _r in _results )
+
+# ******************************************************************************
+# Definition of the lazy chain container:
+
+class lazy_chains:
+    """
+    This class holds a set of chain roots and loads each chain, with
+    :func:`load_chain`, only when it is first requested. Chains that are
+    never used are never read.
+
+    :ivar roots: dictionary with the chain roots, keyed by name.
+    :ivar settings: getdist analysis settings used for all the chains.
+    :ivar prune: weight pruning tolerance of all the chains, see
+        :func:`load_chain`.
+    :ivar prune_method: 'drop' or 'merge' the negligible samples.
+
+    """
+
+    # --------------------------------------------------------------------------
+
+    def __init__(self, roots, settings=None, prune=None, prune_method='drop'):
+        """
+        :param roots: dictionary with the chain roots, keyed by name.
+        :type roots: :class:`dict`
+        :param settings: dictionary of getdist analysis settings.
+        :type settings: :class:`dict`
+        :param prune: weight pruning tolerance, None to keep all the samples.
+        :type prune: :class:`float`
+        :param prune_method: 'drop' or 'merge' the negligible samples.
+        :type prune_method: :class:`string`
+        """
+        self.roots = dict(roots)
+        self.settings = settings
+        self.prune = prune
+        self.prune_method = prune_method
+        self._loaded = {}
+
+    # --------------------------------------------------------------------------
+
+    def __getitem__(self, name):
+        """
+        Returns the chain with the given name, loading it if needed.
+        """
+        if name not in self._loaded:
+            self._loaded[name] = load_chain(self.roots[name], settings=self.settings,
+                                            prune=self.prune, prune_method=self.prune_method)
+        return self._loaded[name]
+
+    # --------------------------------------------------------------------------
+
+    def __contains__(self, name):
+        return name in self.roots
+
+    # --------------------------------------------------------------------------
+
+    def keys(self):
+        """
+        Returns the names of the chains.
+        """
+        return self.roots.keys()
+
+    # --------------------------------------------------------------------------
+
+    def loaded(self):
+        """
+        Returns the names of the chains that have been loaded so far.
+        """
+        return list(self._loaded.keys())
+
+    # --------------------------------------------------------------------------
+
+# ******************************************************************************
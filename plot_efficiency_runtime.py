@@ -3,65 +3,76 @@
 """
 Plotter for evidence as a function of efficiency
 """
+
+# files read and written by this script (used by build_figures.py):
+figure_inputs = []
+figure_output = 'paper_plots/figure_efficiency_runtime.pdf'
+
 if __name__ == "__main__":
     ###############################################################################
     # initial imports:
+    import profiling_utilities as prof
 
-    import os
-    import matplotlib.pyplot as plt
-    import color_utilities as cu
-    import matplotlib.gridspec as gridspec
+    with prof.phase('imports'):
+        import matplotlib.pyplot as plt
+        import color_utilities as cu
+        import plot_utilities as pu
+        import matplotlib.gridspec as gridspec
 
-    #os.environ["PATH"] += os.pathsep + "/usr/local/texlive/2021/bin/universal-darwin"
+        #os.environ["PATH"] += os.pathsep + "/usr/local/texlive/2021/bin/universal-darwin"
     ###############################################################################
     # initial setup:
 
-    # output folder:
-    out_folder = './paper_plots/'
-    if not os.path.exists(out_folder):
-        os.mkdir(out_folder)
+    with prof.phase('setup'):
+        # output folder (paper_plots/draft/ in draft mode):
+        out_folder = pu.output_folder()
 
-    # color palette:
-    colors = [cu.nice_colors(i) for i in range(4)]
+        # color palette:
+        colors = [cu.nice_colors(i) for i in range(4)]
 
-    # latex rendering:
-    plt.rc('font', **{'family': 'serif', 'serif': ['Computer Modern']})
-    plt.rc('text', usetex=True)
+        # latex rendering (mathtext in draft mode):
+        pu.set_style()
 
     ###############################################################################
     # pre computations:
-    eff = [1, 0.3, 0.1, 0.01, 0.001]
-    runtime = [13.8, 16.2, 23.7, 39.3, 109.5]
+    with prof.phase('load'):
+        eff = [1, 0.3, 0.1, 0.01, 0.001]
+        runtime = [13.8, 16.2, 23.7, 39.3, 109.5]
 
     ###############################################################################
     # do the plot:
 
-    # plot size in cm. Has to match to draft to make sure font sizes are consistent
-    x_size = 8.99
-    y_size = 7.0
-    main_fontsize = 10.0
+    with prof.phase('plot'):
+        # plot size in cm. Has to match to draft to make sure font sizes are consistent
+        x_size = 8.99
+        y_size = 7.0
+        main_fontsize = 10.0
 
-    # start the plot:
-    fig = plt.gcf()
-    fig.set_size_inches( x_size/2.54, y_size/2.54 )
-    gs = gridspec.GridSpec(1,1)
-    ax1 = plt.subplot(gs[0,0])
+        # start the plot:
+        fig = plt.gcf()
+        fig.set_size_inches( x_size/2.54, y_size/2.54 )
+        gs = gridspec.GridSpec(1,1)
+        ax1 = plt.subplot(gs[0,0])
 
-    # do the plot:
-    ax1.errorbar(eff, runtime, fmt = '.', color=colors[0])
+        # do the plot:
+        ax1.errorbar(eff, runtime, fmt = '.', color=colors[0])
 
-    # label on the axis:
-    ax1.set_xlabel('Efficiency', fontsize=main_fontsize);
-    ax1.set_ylabel('Runtime (hours)', fontsize=main_fontsize);
+        # label on the axis:
+        ax1.set_xlabel('Efficiency', fontsize=main_fontsize);
+        ax1.set_ylabel('Runtime (hours)', fontsize=main_fontsize);
 
-    ax1.set_xscale('log')
-    ax1.set_yscale('log')
+        ax1.set_xscale('log')
+        ax1.set_yscale('log')
 
-    # update dimensions:
-    bottom=0.15; top=0.99; left=0.23; right=0.99; wspace=0.03; hspace=0.05
-    gs.update( bottom=bottom, top=top, left=left, right=right, wspace=wspace, hspace=hspace )
+        # update dimensions:
+        bottom=0.15; top=0.99; left=0.23; right=0.99; wspace=0.03; hspace=0.05
+        gs.update( bottom=bottom, top=top, left=left, right=right, wspace=wspace, hspace=hspace )
 
     # save:
-    plt.savefig(out_folder+'/figure_efficiency_runtime.pdf')
+    with prof.phase('save'):
+        pu.save_figure(plt.gcf(), out_folder+'/figure_efficiency_runtime.pdf')
+
+    # profile of the phases (only with SAMPLER_PLOTS_PROFILE set):
+    prof.write_trace('figure_efficiency_runtime')
 
-    plt.show()
\ No newline at end of file
+    pu.show()
\ No newline at end of file
@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing plotting helpers shared by the plot scripts.
+
+The figures can be rendered in two modes, selected with the SAMPLER_PLOTS_MODE
+environment variable (or the --draft option of build_figures.py):
+    final (default): LaTeX labels, vector output in paper_plots/;
+    draft: mathtext labels, lower resolution and rasterized dense artists,
+        output in paper_plots/draft/. Meant for fast layout iterations.
+
+In both modes save_figure rasterizes the data artists with more vertices than
+the threshold of the mode (scatter clouds, long traces) while text, axes and
+the lighter artists stay vector, so that the size and saving time of the
+figures are bounded by the page and not by the data.
+
+Figures are written in the formats listed in the SAMPLER_PLOTS_FORMATS
+environment variable (comma separated, default pdf), all from the same
+figure. With SAMPLER_PLOTS_BATCH set (as in the build_figures.py workers)
+the scripts run headless: matplotlib uses the Agg backend, no GUI toolkit is
+imported and show() closes the figures instead of opening windows.
+
+"""
+
+# ******************************************************************************
+
+import os
+import numpy as np
+
+# ******************************************************************************
+# definition of the rendering modes:
+
+render_modes = ['final', 'draft']
+
+draft_dpi = 72 #: resolution of the rasterized parts of draft figures.
+draft_rasterize_vertices = 1000 #: artists with more vertices are rasterized in draft mode.
+final_dpi = 300 #: resolution of the rasterized parts of final figures.
+final_rasterize_vertices = 20000 #: artists with more vertices are rasterized in final mode.
+
+# threshold and resolution of the rasterization of each mode:
+rasterize_settings = {'final': (final_rasterize_vertices, final_dpi),
+                      'draft': (draft_rasterize_vertices, draft_dpi),
+                      }
+
+# ------------------------------------------------------------------------------
+
+def render_mode():
+    """
+    This function returns the render mode, from the SAMPLER_PLOTS_MODE
+    environment variable (default final). It is read at every call, so
+    that a process that imported this module before the mode was set (e.g.
+    the workers forked by build_figures.py, or the render server) follows it.
+
+    :return: 'final' or 'draft'.
+    """
+    return os.environ.get('SAMPLER_PLOTS_MODE', 'final')
+
+# ------------------------------------------------------------------------------
+
+def batch_mode():
+    """
+    This function returns True in batch mode, when the SAMPLER_PLOTS_BATCH
+    environment variable is set. It is read at every call, as the mode.
+    """
+    return os.environ.get('SAMPLER_PLOTS_BATCH', '').lower() not in ['', '0', 'false', 'no']
+
+if batch_mode():
+    # before any figure is created, so that no GUI backend is ever loaded
+    # (build_figures.py workers also set MPLBACKEND before any import):
+    import matplotlib
+    matplotlib.use('Agg')
+
+# ------------------------------------------------------------------------------
+
+def output_formats():
+    """
+    This function returns the formats the figures are written in, from the
+    SAMPLER_PLOTS_FORMATS environment variable (comma separated, default
+    pdf). It is read at every call, so that a long-lived process (e.g. the
+    render server) follows the changes.
+
+    :return: list of format names, e.g. ['pdf', 'png'].
+    """
+    return [ _f.strip().lower() for _f in os.environ.get('SAMPLER_PLOTS_FORMATS', 'pdf').split(',') if _f.strip() ]
+
+# ------------------------------------------------------------------------------
+
+def _check_mode( mode ):
+    """
+    Returns the requested mode, defaulting to :func:`render_mode`, or raises.
+    """
+    if mode is None:
+        mode = render_mode()
+    if mode not in render_modes:
+        raise ValueError('Requested render mode ('+str(mode)+') does not exist.')
+    return mode
+
+# ------------------------------------------------------------------------------
+
+def set_style( mode=None ):
+    """
+    This function sets the matplotlib text rendering of the figures.
+    In final mode labels are rendered with LaTeX in Computer Modern (the
+    LaTeX output of every label is kept by matplotlib in its own cache folder
+    and reused by later runs). In draft mode labels are rendered with mathtext
+    and the Computer Modern fonts shipped with matplotlib, with no LaTeX run.
+
+    :param mode: 'final' or 'draft'. Defaults to :func:`render_mode`.
+    :type mode: :class:`string`
+    """
+    import matplotlib.pyplot as plt
+    _mode = _check_mode(mode)
+    if _mode == 'final':
+        plt.rc('font', **{'family': 'serif', 'serif': ['Computer Modern']})
+        plt.rc('text', usetex=True)
+    else:
+        plt.rc('font', **{'family': 'serif', 'serif': ['cmr10']})
+        plt.rc('text', usetex=False)
+        plt.rc('mathtext', fontset='cm')
+        plt.rc('axes.formatter', use_mathtext=True)
+        plt.rc('figure', dpi=draft_dpi)
+        plt.rc('savefig', dpi=draft_dpi)
+
+# ------------------------------------------------------------------------------
+
+def output_folder( mode=None ):
+    """
+    This function returns (and creates if needed) the output folder of the
+    figures: paper_plots/ in final mode and paper_plots/draft/ in draft mode.
+
+    :param mode: 'final' or 'draft'. Defaults to :func:`render_mode`.
+    :type mode: :class:`string`
+
+    :return: path of the folder.
+    """
+    _folder = './paper_plots/'
+    if _check_mode(mode) == 'draft':
+        _folder += 'draft/'
+    if not os.path.exists(_folder):
+        os.makedirs(_folder)
+    return _folder
+
+# ------------------------------------------------------------------------------
+
+def num_vertices( artist ):
+    """
+    This function returns the number of vertices an artist writes to a vector
+    output: points of lines and patches, and for collections the vertices of
+    all their paths repeated at all their offsets.
+
+    :param artist: the artist.
+    :type artist: :class:`matplotlib.artist.Artist`
+
+    :return: integer number of vertices.
+    """
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
+    from matplotlib.collections import Collection
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata())
+    if isinstance(artist, Patch):
+        return len(artist.get_path().vertices)
+    if isinstance(artist, Collection):
+        _path_vertices = sum( len(_p.vertices) for _p in artist.get_paths() )
+        _num_offsets = len(artist.get_offsets())
+        if len(artist.get_paths()) == 1 and _num_offsets > 1:
+            return _path_vertices*_num_offsets
+        return _path_vertices+_num_offsets
+    return 0
+
+# ------------------------------------------------------------------------------
+
+def artist_costs( fig ):
+    """
+    This function returns the output cost of the data artists of a figure,
+    i.e. the artists drawn inside axes, excluding text and the axes
+    decorations, from the most to the least expensive.
+
+    :param fig: the figure.
+    :type fig: :class:`matplotlib.figure.Figure`
+
+    :return: list of dictionaries with the artist, a description, its
+        number of vertices and whether it is rasterized.
+    """
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
+    from matplotlib.collections import Collection
+    _costs = []
+    for _i, _ax in enumerate(fig.axes):
+        _decorations = set([_ax.patch]+list(_ax.spines.values()))
+        for _artist in _ax.get_children():
+            if not isinstance(_artist, (Line2D, Patch, Collection)) or _artist in _decorations:
+                continue
+            _label = _artist.get_label()
+            _description = 'axes %d: %s' % (_i, type(_artist).__name__)
+            if _label and not _label.startswith('_'):
+                _description += " '"+_label+"'"
+            _costs.append({'artist': _artist, 'description': _description,
+                           'vertices': num_vertices(_artist),
+                           'rasterized': bool(_artist.get_rasterized())})
+    return sorted(_costs, key=lambda _c: -_c['vertices'])
+
+# ------------------------------------------------------------------------------
+
+def print_costs( costs, filename, num_artists=10 ):
+    """
+    This function prints the output cost of the most expensive artists of a
+    figure, as returned by :func:`artist_costs`.
+    """
+    _vector = sum( _c['vertices'] for _c in costs if not _c['rasterized'] )
+    _raster = sum( _c['vertices'] for _c in costs if _c['rasterized'] )
+    print('output cost of '+os.path.basename(filename)+': %d vector vertices, %d rasterized' % (_vector, _raster))
+    for _c in costs[:num_artists]:
+        print('    %-45s %10d %s' % (_c['description'], _c['vertices'],
+                                     'raster' if _c['rasterized'] else 'vector'))
+
+# ------------------------------------------------------------------------------
+
+def save_figure( fig, filename, mode=None, max_vertices=None, dpi=None, report=None, formats=None ):
+    """
+    This function saves a figure in all the output formats. The data artists
+    with more than max_vertices vertices are rasterized at dpi, text and axes
+    stay vector. The defaults depend on the mode, see rasterize_settings.
+    The layout and the rasterization are set once and shared by all the
+    formats.
+
+    :param fig: the figure.
+    :type fig: :class:`matplotlib.figure.Figure`
+    :param filename: output file.
+    :type filename: :class:`string`
+    :param mode: 'final' or 'draft'. Defaults to :func:`render_mode`.
+    :type mode: :class:`string`
+    :param max_vertices: rasterization threshold, None for the one of the
+        mode.
+    :type max_vertices: :class:`int`
+    :param dpi: resolution of the rasterized artists, None for the one of
+        the mode.
+    :type dpi: :class:`float`
+    :param report: print the output cost of the artists. Defaults to True
+        when profiling is enabled (SAMPLER_PLOTS_PROFILE).
+    :type report: :class:`bool`
+    :param formats: output formats, e.g. ['pdf', 'png', 'svg'], that replace
+        the extension of filename. Defaults to :func:`output_formats`.
+    :type formats: :class:`list`
+
+    :return: list with the output costs, see :func:`artist_costs`.
+    """
+    _max_vertices, _dpi = rasterize_settings[_check_mode(mode)]
+    if max_vertices is not None:
+        _max_vertices = max_vertices
+    if dpi is not None:
+        _dpi = dpi
+    _costs = artist_costs(fig)
+    for _c in _costs:
+        if _c['vertices'] > _max_vertices:
+            _c['artist'].set_rasterized(True)
+            _c['rasterized'] = True
+    import profiling_utilities as prof
+    if report is None:
+        report = prof.is_enabled()
+    if report:
+        print_costs(_costs, filename)
+    if formats is None:
+        formats = output_formats()
+    if prof.is_enabled():
+        # a first draw without output lays out the text, so that the LaTeX
+        # runs of the labels are profiled apart from the writing of the files:
+        import matplotlib
+        with prof.phase('latex' if matplotlib.rcParams['text.usetex'] else 'text layout'):
+            fig.draw_without_rendering()
+    _root = os.path.splitext(filename)[0]
+    for _format in formats:
+        fig.savefig(_root+'.'+_format, format=_format, dpi=_dpi)
+    return _costs
+
+# ------------------------------------------------------------------------------
+
+def show():
+    """
+    This function ends a plot script: it shows the figures, or in batch mode
+    closes all of them and frees their memory, so that a process rendering
+    many figures does not grow.
+    """
+    import matplotlib.pyplot as plt
+    if not batch_mode():
+        plt.show()
+        return
+    import gc
+    plt.close('all')
+    gc.collect()
+
+# ******************************************************************************
+# definition of the decimation utilities:
+
+def axes_pixel_width( ax ):
+    """
+    This function returns the width of an axes in pixels, at the resolution
+    of its figure.
+
+    :param ax: the axes.
+    :type ax: :class:`matplotlib.axes.Axes`
+
+    :return: integer number of pixels.
+    """
+    return max(int(np.ceil(ax.get_position().width*ax.figure.get_figwidth()*ax.figure.dpi)), 1)
+
+# ------------------------------------------------------------------------------
+
+def minmax_decimate( y, num_buckets ):
+    """
+    This function reduces a long trace to at most 2*num_buckets+2 points
+    while keeping every spike visible. The trace is split into num_buckets
+    consecutive buckets and, for each of them, the minimum and the maximum are
+    kept in their original order. Drawn with one bucket per pixel the result
+    is indistinguishable from the full trace.
+
+    :param y: the trace. Can be a memory mapped array, it is read only once.
+    :type y: :class:`numpy.ndarray`
+    :param num_buckets: number of buckets, typically the width in pixels.
+    :type num_buckets: :class:`int`
+
+    :return: tuple with the sample indexes and the values of the kept points.
+    """
+    _num = len(y)
+    if _num <= 2*num_buckets+2:
+        _x = np.arange(_num)
+        return _x, np.asarray(y[:])
+    _size = int(np.ceil(_num/float(num_buckets)))
+    _num_full = (_num//_size)*_size
+    # full buckets, as a view of the input:
+    _blocks = np.asarray(y[:_num_full]).reshape(-1, _size)
+    _offsets = np.arange(_blocks.shape[0])*_size
+    _idx_min = np.argmin(_blocks, axis=1)+_offsets
+    _idx_max = np.argmax(_blocks, axis=1)+_offsets
+    _idx = [_idx_min, _idx_max]
+    # last partial bucket:
+    if _num_full < _num:
+        _tail = np.asarray(y[_num_full:])
+        _idx.append(np.array([np.argmin(_tail), np.argmax(_tail)])+_num_full)
+    # always keep the end points so that the trace covers the full range:
+    _idx.append(np.array([0, _num-1]))
+    _x = np.unique(np.concatenate(_idx))
+    return _x, np.asarray(y[_x])
+
+# ******************************************************************************
+# definition of the errorbar utilities:
+
+def jitter_positions( x, num_jitter, width, log=False ):
+    """
+    This function spreads num_jitter copies of each x position evenly over
+    a band of the given width centered on it, so that repeated measurements
+    at the same x do not overlap. On a logarithmic axis the band is in
+    decades, so it looks the same at every x.
+
+    :param x: array with the N positions.
+    :type x: :class:`numpy.ndarray`
+    :param num_jitter: number of copies of each position.
+    :type num_jitter: :class:`int`
+    :param width: width of the band (in decades if log).
+    :type width: :class:`float`
+    :param log: if True jitter in log space.
+    :type log: :class:`bool`
+
+    :return: (N,num_jitter) array of jittered positions.
+    """
+    _x = np.asarray(x, dtype=np.float64)[:, None]
+    _offsets = np.linspace(-0.5*width, 0.5*width, num_jitter)[None, :]
+    if log:
+        return _x*10.**_offsets
+    return _x+_offsets
+
+# ------------------------------------------------------------------------------
+
+def jittered_errorbars( ax, x, y, yerr, width=0.1, log=None, color=None, alpha=1.0,
+                        marker='.', markersize=None, linewidth=None, label=None ):
+    """
+    This function draws the results of many repeated runs, e.g. one per seed,
+    as jittered points with error bars. All the points are drawn as a single
+    line without segments and all the error bars as a single line collection,
+    so the number of artists (and the size of the output) does not depend on
+    the number of runs. NaN values are skipped.
+
+    :param ax: the axes.
+    :type ax: :class:`matplotlib.axes.Axes`
+    :param x: array with the N positions.
+    :param y: (N,M) array of values, M runs at each position.
+    :param yerr: (N,M) array of symmetric errors.
+    :param width: width of the jitter band, see :func:`jitter_positions`.
+    :param log: jitter in log space. Defaults to the x scale of the axes.
+    :param color: color of points and error bars.
+    :param alpha: transparency of points and error bars.
+    :param label: legend label, attached to the points.
+
+    :return: tuple with the points and the error bars artists.
+    """
+    from matplotlib.collections import LineCollection
+    import matplotlib.pyplot as plt
+    _y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    _yerr = np.broadcast_to(np.asarray(yerr, dtype=np.float64), _y.shape)
+    if log is None:
+        log = ax.get_xscale() == 'log'
+    _x = jitter_positions(x, _y.shape[1], width, log=log)
+    _valid = np.isfinite(_y) & np.isfinite(_yerr)
+    _x, _y, _yerr = _x[_valid], _y[_valid], _yerr[_valid]
+    if color is None:
+        color = ax._get_lines.get_next_color()
+    if linewidth is None:
+        linewidth = plt.rcParams['lines.linewidth']
+    # error bars:
+    _segments = np.stack([np.stack([_x, _y-_yerr], axis=1),
+                          np.stack([_x, _y+_yerr], axis=1)], axis=1)
+    _bars = LineCollection(_segments, colors=color, alpha=alpha, linewidths=linewidth)
+    ax.add_collection(_bars, autolim=True)
+    # points:
+    _points, = ax.plot(_x, _y, ls='none', marker=marker, markersize=markersize,
+                       color=color, alpha=alpha, label=label)
+    ax.autoscale_view()
+    return _points, _bars
+
+# ******************************************************************************
+# definition of the confidence ellipse utilities:
+
+def weighted_mean_covariance( samples, weights=None ):
+    """
+    This function returns the (weighted) mean and covariance of a set of
+    samples.
+
+    :param samples: (N,D) array of samples.
+    :type samples: :class:`numpy.ndarray`
+    :param weights: optional array of N sample weights.
+    :type weights: :class:`numpy.ndarray`
+
+    :return: tuple with the (D,) mean and the (D,D) covariance.
+    """
+    _samples = np.atleast_2d(samples)
+    _mean = np.average(_samples, axis=0, weights=weights)
+    _cov = np.atleast_2d(np.cov(_samples, rowvar=False, aweights=weights))
+    return _mean, _cov
+
+# ------------------------------------------------------------------------------
+
+def pair_covariances( samples, weights=None, pairs=None ):
+    """
+    This function returns the means and the 2x2 covariances of all the
+    parameter pairs of a set of samples, computing the full covariance once.
+
+    :param samples: (N,D) array of samples.
+    :type samples: :class:`numpy.ndarray`
+    :param weights: optional array of N sample weights.
+    :type weights: :class:`numpy.ndarray`
+    :param pairs: optional list of (i,j) parameter index pairs. Defaults to
+        all the pairs with i<j.
+    :type pairs: :class:`list`
+
+    :return: tuple with the list of pairs, the (P,2) means and the (P,2,2)
+        covariances.
+    """
+    _mean, _cov = weighted_mean_covariance(samples, weights)
+    if pairs is None:
+        pairs = [ (_i, _j) for _i in range(len(_mean)) for _j in range(_i+1, len(_mean)) ]
+    _idx = np.array(pairs, dtype=int).reshape(-1, 2)
+    _means = _mean[_idx]
+    _covs = _cov[_idx[:, :, np.newaxis], _idx[:, np.newaxis, :]]
+    return pairs, _means, _covs
+
+# ------------------------------------------------------------------------------
+
+def ellipse_geometry( covs, n_std=1.0 ):
+    """
+    This function returns the full axes lengths and the orientation of the
+    confidence ellipses of one or many 2x2 covariances, from their
+    eigendecomposition.
+
+    :param covs: (2,2) or (P,2,2) array of covariances.
+    :type covs: :class:`numpy.ndarray`
+    :param n_std: the number of standard deviations of the ellipses radii.
+    :type n_std: :class:`float`
+
+    :return: tuple with widths, heights and angles (in degrees, counter
+        clockwise from the x axis to the width axis).
+    """
+    _eigval, _eigvec = np.linalg.eigh(np.asarray(covs, dtype=np.float64))
+    _eigval = np.clip(_eigval, 0., None)
+    # eigh sorts the eigenvalues, the width is along the largest one:
+    _widths = 2.*n_std*np.sqrt(_eigval[..., 1])
+    _heights = 2.*n_std*np.sqrt(_eigval[..., 0])
+    _angles = np.degrees(np.arctan2(_eigvec[..., 1, 1], _eigvec[..., 0, 1]))
+    return _widths, _heights, _angles
+
+# ------------------------------------------------------------------------------
+
+def confidence_ellipse( mean, cov, n_std=1.0, facecolor='none', **kwargs ):
+    """
+    This function returns the confidence ellipse of a 2D Gaussian with any
+    covariance, as a single patch.
+
+    :param mean: center of the ellipse.
+    :param cov: (2,2) covariance.
+    :param n_std: the number of standard deviations of the ellipse radii.
+    :type n_std: :class:`float`
+    :param kwargs: `~matplotlib.patches.Patch` properties.
+
+    :return: :class:`matplotlib.patches.Ellipse`
+    """
+    from matplotlib.patches import Ellipse
+    _width, _height, _angle = ellipse_geometry(cov, n_std)
+    return Ellipse(tuple(mean), width=float(_width), height=float(_height), angle=float(_angle),
+                   facecolor=facecolor, **kwargs)
+
+# ------------------------------------------------------------------------------
+
+def confidence_ellipses( ax, means, covs, n_std=1.0, facecolor='none', **kwargs ):
+    """
+    This function returns the confidence ellipses of many 2D Gaussians (all
+    the iterations of a run, all the pairs of a chain, ...) as a single
+    collection, in data coordinates of the given axes. The collection still
+    has to be added to the axes with ax.add_collection.
+
+    :param ax: the axes the ellipses are drawn into.
+    :type ax: :class:`matplotlib.axes.Axes`
+    :param means: (P,2) array with the centers.
+    :param covs: (P,2,2) array with the covariances.
+    :param n_std: the number of standard deviations of the ellipses radii.
+    :type n_std: :class:`float`
+    :param kwargs: `~matplotlib.collections.Collection` properties.
+
+    :return: :class:`matplotlib.collections.EllipseCollection`
+    """
+    from matplotlib.collections import EllipseCollection
+    _widths, _heights, _angles = ellipse_geometry(covs, n_std)
+    return EllipseCollection(np.atleast_1d(_widths), np.atleast_1d(_heights), np.atleast_1d(_angles),
+                             units='xy', offsets=np.atleast_2d(means),
+                             offset_transform=ax.transData,
+                             facecolor=facecolor, **kwargs)
+
+# ------------------------------------------------------------------------------
+
+def ellipse_outline( mean, cov, n_std=1.0, num_points=101 ):
+    """
+    This function returns the points of the outline of a confidence ellipse,
+    to be drawn as a line. Updating the data of a line is cheaper than
+    rebuilding a patch, which is what animations need.
+
+    :param mean: center of the ellipse.
+    :param cov: (2,2) covariance.
+    :param n_std: the number of standard deviations of the ellipse radii.
+    :type n_std: :class:`float`
+    :param num_points: number of points of the (closed) outline.
+    :type num_points: :class:`int`
+
+    :return: tuple with the x and y coordinates of the outline.
+    """
+    _eigval, _eigvec = np.linalg.eigh(np.asarray(cov, dtype=np.float64))
+    _theta = np.linspace(0., 2.*np.pi, num_points)
+    _circle = np.stack([np.cos(_theta), np.sin(_theta)])
+    _points = np.dot(_eigvec*(n_std*np.sqrt(np.clip(_eigval, 0., None))), _circle)
+    return _points[0]+mean[0], _points[1]+mean[1]
+
+# ******************************************************************************
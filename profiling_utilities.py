@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing the opt-in profiling of the plot scripts.
+
+Profiling is enabled by the SAMPLER_PLOTS_PROFILE environment variable (or
+by build_figures.py --profile). Each phase of a script, e.g. loading the
+chains or saving the figure, is wrapped in :func:`phase`, which records its
+wall time, CPU time and peak memory (traced with tracemalloc). At the end of
+the script :func:`write_trace` writes the phases in the Chrome trace event
+format, readable by chrome://tracing, Perfetto or speedscope (as a flame
+graph).
+
+SAMPLER_PLOTS_PROFILE=1 writes the traces to .cache/profiles, any other
+value is used as the output folder. The variable is read at every phase, so
+a long-lived process (e.g. the render server) can profile some jobs only.
+When profiling is disabled :func:`phase` returns a shared do-nothing context
+manager and nothing is traced. Memory tracing, started by the first phase,
+is stopped by :func:`write_trace` and :func:`clear`, so that the next jobs
+of a long-lived process do not pay for it.
+
+tracemalloc slows down the code it traces, with SAMPLER_PLOTS_PROFILE_MEMORY=0
+the phases record only wall and CPU times (e.g. for benchmarks, that trace
+the memory in a separate run).
+
+"""
+
+# ******************************************************************************
+
+import os
+import json
+import time
+import contextlib
+
+import cache_utilities as cache
+
+# ******************************************************************************
+# profiling settings:
+
+_no_phase = contextlib.nullcontext()
+_events = []   # completed phases, as trace events
+_stack = []    # running phases, with the peak memory of their closed children
+_tracing = []  # non-empty if memory tracing was started by the phases
+
+# ------------------------------------------------------------------------------
+
+def is_enabled():
+    """
+    This function returns True if profiling is enabled, i.e. if the
+    SAMPLER_PLOTS_PROFILE environment variable is set.
+    """
+    return os.environ.get('SAMPLER_PLOTS_PROFILE', '').lower() not in ['', '0', 'false', 'no']
+
+# ------------------------------------------------------------------------------
+
+def memory_enabled():
+    """
+    This function returns True if the phases trace the peak memory, i.e.
+    unless the SAMPLER_PLOTS_PROFILE_MEMORY environment variable is 0.
+    """
+    return os.environ.get('SAMPLER_PLOTS_PROFILE_MEMORY', '1').lower() not in ['', '0', 'false', 'no']
+
+# ------------------------------------------------------------------------------
+
+def profile_folder():
+    """
+    This function returns (and creates if needed) the folder of the traces.
+    """
+    _setting = os.environ.get('SAMPLER_PLOTS_PROFILE', '')
+    if _setting.lower() in ['1', 'true', 'yes']:
+        return cache.cache_folder('profiles')
+    if not os.path.exists(_setting):
+        os.makedirs(_setting, exist_ok=True)
+    return _setting
+
+# ------------------------------------------------------------------------------
+
+def _stop_tracing():
+    """
+    Stops the memory tracing, if it was started by the phases.
+    """
+    if _tracing:
+        import tracemalloc
+        tracemalloc.stop()
+        del _tracing[:]
+
+# ------------------------------------------------------------------------------
+
+def clear():
+    """
+    This function forgets the phases recorded so far, e.g. those of a script
+    that failed before writing its trace, and stops the memory tracing.
+    """
+    del _events[:]
+    del _stack[:]
+    _stop_tracing()
+
+# ******************************************************************************
+# definition of the profiling utilities:
+
+@contextlib.contextmanager
+def _traced_phase( name ):
+    """
+    Records a phase: wall time, CPU time and peak traced memory, including
+    the nested phases.
+    """
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracing.append(True)
+    # the peak so far belongs to the enclosing phase:
+    if _stack:
+        _stack[-1]['peak'] = max(_stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    _frame = {'peak': 0}
+    _stack.append(_frame)
+    _start_wall, _start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        _wall, _cpu = time.perf_counter()-_start_wall, time.process_time()-_start_cpu
+        _stack.pop()
+        _peak = max(_frame['peak'], tracemalloc.get_traced_memory()[1])
+        if _stack:
+            _stack[-1]['peak'] = max(_stack[-1]['peak'], _peak)
+        tracemalloc.reset_peak()
+        _events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                        'ts': _start_wall*1.e6, 'dur': _wall*1.e6,
+                        'args': {'wall': _wall, 'cpu': _cpu, 'peak_memory': _peak}})
+
+# ------------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def _timed_phase( name ):
+    """
+    Records a phase without tracing the memory: wall time and CPU time.
+    """
+    _start_wall, _start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        _wall, _cpu = time.perf_counter()-_start_wall, time.process_time()-_start_cpu
+        _events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                        'ts': _start_wall*1.e6, 'dur': _wall*1.e6,
+                        'args': {'wall': _wall, 'cpu': _cpu, 'peak_memory': None}})
+
+# ------------------------------------------------------------------------------
+
+def phase( name ):
+    """
+    This function returns a context manager profiling a phase of a script,
+    or a do-nothing one if profiling is disabled. Phases can be nested.
+
+    Usage:
+        with phase('load chains'):
+            chains = ...
+
+    :param name: name of the phase.
+    :type name: :class:`string`
+    """
+    if not is_enabled():
+        return _no_phase
+    if not memory_enabled():
+        return _timed_phase(name)
+    return _traced_phase(name)
+
+# ------------------------------------------------------------------------------
+
+def write_trace( name ):
+    """
+    This function writes the phases recorded so far to name.trace.json in
+    the profile folder, in the Chrome trace event format, prints a summary
+    and clears them (see :func:`clear`). Does nothing if profiling is
+    disabled.
+
+    :param name: name of the trace, e.g. the figure name.
+    :type name: :class:`string`
+
+    :return: path of the trace file, or None.
+    """
+    if not is_enabled():
+        return None
+    _file_name = os.path.join(profile_folder(), name+'.trace.json')
+    _temp = cache.temporary_name(_file_name)
+    with open(_temp, 'w') as _file:
+        json.dump({'traceEvents': _events, 'displayTimeUnit': 'ms',
+                   'otherData': {'name': name}}, _file, indent=1)
+    os.replace(_temp, _file_name)
+    for _event in sorted(_events, key=lambda _e: _e['ts']):
+        _args = _event['args']
+        _peak = '' if _args['peak_memory'] is None else '  peak %8.1f MB' % (_args['peak_memory']/2.**20)
+        print('profile %s: %-20s wall %8.3f s  cpu %8.3f s%s' % (
+              name, _event['name'], _args['wall'], _args['cpu'], _peak))
+    clear()
+    return _file_name
+
+# ******************************************************************************
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""
+Long-lived render server for the figure scripts.
+
+The server imports matplotlib, scipy and getdist once, keeps fonts and the
+loaded chains in memory and renders figures on request, so that repeated
+re-renders do not pay the interpreter start-up, the imports and the chain
+loading every time. Figures are closed after every job.
+
+Requests are sent over a local socket, authenticated with a random key
+stored in the repository cache, so only the same user can connect.
+
+When no server is running (or it does not answer) render falls back to
+rendering the figures locally, as build_figures.py --force does.
+
+Usage:
+    python render_server.py serve                   # start the server
+    python render_server.py render [--draft] [--profile] [--formats pdf,png,svg] [figure ...]
+    python render_server.py stop
+"""
+
+# ******************************************************************************
+
+import os
+import sys
+import time
+import argparse
+import importlib
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import cache_utilities as cache
+import build_figures as bf
+
+# ******************************************************************************
+# connection settings:
+
+server_port = int(os.environ.get('SAMPLER_PLOTS_SERVER_PORT', 47613))
+
+# ------------------------------------------------------------------------------
+
+def _authkey( create=False ):
+    """
+    Returns the key shared by server and clients, creating a new random one
+    when the server starts.
+    """
+    _key_file = os.path.join(cache.cache_folder(), 'render_server.key')
+    if create:
+        _temp = cache.temporary_name(_key_file)
+        with open(os.open(_temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as _file:
+            _file.write(os.urandom(32))
+        os.replace(_temp, _key_file)
+    if not os.path.exists(_key_file):
+        raise IOError('Render server is not running (no key in '+_key_file+').')
+    with open(_key_file, 'rb') as _file:
+        return _file.read()
+
+# ******************************************************************************
+# server:
+
+# modules imported once by the server, and those that can be missing:
+warm_modules = ['matplotlib.pyplot', 'matplotlib.font_manager', 'scipy.stats', 'getdist.plots',
+                'color_utilities', 'plot_utilities']
+optional_warm_modules = ['getdist.plots']
+
+def _warm_up():
+    """
+    Imports the heavy modules and loads the fonts once.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    for _name in warm_modules:
+        try:
+            importlib.import_module(_name)
+        except ImportError:
+            if _name not in optional_warm_modules:
+                raise
+    sys.modules['matplotlib.font_manager'].findfont('serif')
+
+# ------------------------------------------------------------------------------
+
+_module_times = {}
+
+def _repository_modules( folder ):
+    """
+    Returns the (name, file) of the loaded modules of the repository that
+    can be reloaded.
+    """
+    _modules = []
+    for _name, _module in list(sys.modules.items()):
+        _file = getattr(_module, '__file__', None)
+        if _file is None or os.path.dirname(os.path.abspath(_file)) != folder:
+            continue
+        if _name in ['__main__', 'build_figures', 'cache_utilities']:
+            continue
+        _modules.append((_name, _file))
+    return _modules
+
+# ------------------------------------------------------------------------------
+
+def _record_module_times( folder ):
+    """
+    Records the modification time of the repository modules imported since
+    the last call. Called right after the warm up and after every job, so
+    that the reference is the version that was imported.
+    """
+    for _name, _file in _repository_modules(folder):
+        if _name not in _module_times:
+            _module_times[_name] = os.path.getmtime(_file) if os.path.exists(_file) else None
+
+# ------------------------------------------------------------------------------
+
+def _forget_modified_modules( folder ):
+    """
+    Removes from sys.modules the repository modules that changed on disk
+    since they were imported, so that the next job imports the new version.
+    Unchanged modules, and what they hold (e.g. loaded chains), are kept.
+    """
+    for _name, _file in _repository_modules(folder):
+        if _name not in _module_times:
+            continue
+        _time = os.path.getmtime(_file) if os.path.exists(_file) else None
+        if _module_times[_name] != _time:
+            del sys.modules[_name]
+            del _module_times[_name]
+
+# ------------------------------------------------------------------------------
+
+def _set_mode( mode, formats=None, profile=False ):
+    """
+    Sets the render mode, the output formats and the profiling for the next
+    jobs, see plot_utilities and profiling_utilities.
+    """
+    os.environ['SAMPLER_PLOTS_MODE'] = mode
+    if formats is not None:
+        os.environ['SAMPLER_PLOTS_FORMATS'] = formats
+    else:
+        os.environ.pop('SAMPLER_PLOTS_FORMATS', None)
+    if profile:
+        os.environ['SAMPLER_PLOTS_PROFILE'] = '1'
+    else:
+        os.environ.pop('SAMPLER_PLOTS_PROFILE', None)
+
+# ------------------------------------------------------------------------------
+
+def serve( folder ):
+    """
+    This function runs the render server until a stop request is received.
+
+    :param folder: repository folder.
+    :type folder: :class:`string`
+    """
+    import gc
+    bf._init_worker(folder, os.environ.get('SAMPLER_PLOTS_MODE', 'final'))
+    _start = time.time()
+    _warm_up()
+    _record_module_times(folder)
+    print('render server warm in %.1f s, listening on port %d' % (time.time()-_start, server_port))
+    _listener = Listener(('localhost', server_port), authkey=_authkey(create=True))
+    try:
+        while True:
+            try:
+                _connection = _listener.accept()
+            except (OSError, EOFError, AuthenticationError) as _error:
+                # a client with a stale key, or that hung up, is not served:
+                print('refused a connection: '+str(_error))
+                continue
+            with _connection:
+                _request = _connection.recv()
+                if _request.get('command') == 'stop':
+                    _connection.send({'status': 'stopped'})
+                    break
+                if _request.get('command') == 'ping':
+                    _connection.send({'status': 'ok', 'pid': os.getpid()})
+                    continue
+                # render the requested figures:
+                _forget_modified_modules(folder)
+                _mode = _request.get('mode', 'final')
+                _set_mode(_mode, _request.get('formats'), _request.get('profile', False))
+                _results = []
+                try:
+                    _figures = bf.select_figures(bf.discover_figures(folder), _request.get('figures', []))
+                except ValueError as _error:
+                    _connection.send({'status': 'error', 'error': str(_error)})
+                    continue
+                for _figure in _figures:
+                    # keyed as in build_figures.py, which then finds the figure up to date:
+                    _key = bf.render_key(_figure, folder, _mode)
+                    _script, _elapsed, _error = bf.render_figure(os.path.abspath(_figure['script']))
+                    bf.finish_render(_figure, _key, (_script, _elapsed, _error), folder, _mode)
+                    _results.append((os.path.basename(_script), _elapsed, _error))
+                _record_module_times(folder)
+                gc.collect()
+                _connection.send({'status': 'ok', 'results': _results})
+    finally:
+        _listener.close()
+        os.remove(os.path.join(cache.cache_folder(), 'render_server.key'))
+
+# ******************************************************************************
+# client:
+
+def request( message ):
+    """
+    This function sends a request to the running render server and returns
+    its answer.
+
+    :param message: dictionary with the request: {'command': 'render',
+        'figures': [...], 'mode': 'final', 'formats': 'pdf,png',
+        'profile': False},
+        {'command': 'ping'} or {'command': 'stop'}.
+    :type message: :class:`dict`
+
+    :return: dictionary with the answer of the server.
+
+    :raises IOError: if the server is not running, or does not accept the
+        key (e.g. a stale key file left by a server that was killed).
+    """
+    try:
+        with Client(('localhost', server_port), authkey=_authkey()) as _connection:
+            _connection.send(message)
+            return _connection.recv()
+    except (OSError, EOFError, AuthenticationError) as _error:
+        raise IOError('Render server is not running ('+str(_error)+').')
+
+# ------------------------------------------------------------------------------
+
+def render_locally( figures, folder, mode='final', formats=None, profile=False ):
+    """
+    This function renders figures in this process tree, without the server,
+    as build_figures.py --force does.
+
+    :return: list of (script name, elapsed time, error) tuples, as in the
+        answers of the server.
+    """
+    _set_mode(mode, formats, profile)
+    _figures = bf.select_figures(bf.discover_figures(folder), figures)
+    _results = bf.build(_figures, folder, force=True, mode=mode)
+    return [ (os.path.basename(_script), _elapsed, _error) for _script, _elapsed, _error in _results ]
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Warm render server for the paper figures.')
+    parser.add_argument('command', choices=['serve', 'render', 'ping', 'stop'])
+    parser.add_argument('figures', nargs='*', help='plot scripts to render (default: all of them)')
+    parser.add_argument('-d', '--draft', action='store_true', help='render in draft mode')
+    parser.add_argument('--formats', default=None,
+                        help='comma separated output formats, e.g. pdf,png,svg (default: pdf)')
+    parser.add_argument('-p', '--profile', action='store_true',
+                        help='profile the phases of the scripts, see profiling_utilities')
+    args = parser.parse_intermixed_args()
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+    if args.command == 'serve':
+        serve(folder)
+    elif args.command == 'render':
+        start = time.time()
+        mode = 'draft' if args.draft else 'final'
+        local = False
+        try:
+            answer = request({'command': 'render', 'figures': args.figures, 'mode': mode,
+                              'formats': args.formats, 'profile': args.profile})
+        except IOError:
+            # the local build reports each figure itself:
+            print('server not running, rendering locally')
+            local = True
+            try:
+                answer = {'status': 'ok',
+                          'results': render_locally(args.figures, folder, mode, args.formats, args.profile)}
+            except ValueError as error:
+                answer = {'status': 'error', 'error': str(error)}
+        if answer['status'] != 'ok':
+            print('ERROR: '+answer['error'])
+            sys.exit(1)
+        for name, elapsed, error in answer['results']:
+            if local:
+                continue
+            if error is None:
+                print('rendered %s in %.2f s' % (name, elapsed))
+            else:
+                print('FAILED %s after %.2f s:\n%s' % (name, elapsed, error))
+        print('total %.2f s' % (time.time()-start))
+        if any( _r[2] is not None for _r in answer['results'] ):
+            sys.exit(1)
+    else:
+        try:
+            print(request({'command': args.command}))
+        except IOError:
+            print('server not running')
+            sys.exit(args.command != 'stop')
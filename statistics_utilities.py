@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Module containing statistical utilities for the plot scripts.
+
+"""
+
+# ******************************************************************************
+
+import functools
+import numpy as np
+from scipy.stats import chi2
+from scipy.special import logsumexp
+
+# ******************************************************************************
+# definition of the credible level utilities:
+
+def _weighted_select( values, weights, target ):
+    """
+    Returns the smallest value such that the total weight of the values
+    smaller or equal to it exceeds target, or the largest value if no value
+    does (target at or above the total weight, e.g. by round-off, or all
+    weights zero). Uses a quickselect on the median, so the cost is linear
+    in the number of values.
+    """
+    _values = np.asarray(values)
+    _weights = np.asarray(weights)
+    if len(_values) == 0:
+        raise ValueError('No values to select from.')
+    if target >= np.sum(_weights):
+        return np.max(_values)
+    target = max(target, 0.)
+    while len(_values) > 1024:
+        _mid = len(_values)//2
+        _pivot = np.partition(_values, _mid)[_mid]
+        _less = _values < _pivot
+        _equal = _values == _pivot
+        _w_less = np.sum(_weights[_less])
+        _w_equal = np.sum(_weights[_equal])
+        if _w_less > target:
+            _values, _weights = _values[_less], _weights[_less]
+        elif _w_less+_w_equal > target:
+            return _pivot
+        else:
+            target -= _w_less+_w_equal
+            _greater = ~(_less | _equal)
+            # nothing above the pivot, the target was reached up to round-off:
+            if not np.any(_greater):
+                return _pivot
+            _values, _weights = _values[_greater], _weights[_greater]
+    # few values left, sort them:
+    _sort = np.argsort(_values, kind='stable')
+    _cumulative = np.cumsum(_weights[_sort])
+    _idx = min(np.searchsorted(_cumulative, target, side='right'), len(_values)-1)
+    return _values[_sort][_idx]
+
+# ------------------------------------------------------------------------------
+
+def credible_levels( density, probabilities, weights=None ):
+    """
+    This function computes the highest density contour levels enclosing the
+    given probabilities, from the values of the density at a set of
+    (optionally weighted) samples. The level for probability p is the density
+    value above which a fraction p of the samples (of the total weight) lies.
+
+    Unweighted samples are handled with a single partition pass for all the
+    levels, weighted ones with one linear time selection per level.
+
+    :param density: density (or likelihood) evaluated at the samples.
+    :type density: :class:`numpy.ndarray`
+    :param probabilities: list of probabilities, e.g. [0.68, 0.95, 0.997].
+    :type probabilities: :class:`list`
+    :param weights: optional sample weights.
+    :type weights: :class:`numpy.ndarray`
+
+    :return: array with the density levels, in the order of probabilities.
+    """
+    _density = np.ravel(density)
+    _num = len(_density)
+    _probabilities = np.atleast_1d(probabilities)
+    if np.any(_probabilities <= 0.) or np.any(_probabilities >= 1.):
+        raise ValueError('Probabilities have to be between zero and one.')
+    if weights is None:
+        _kth = np.array([ int((1.-_p)*_num) for _p in _probabilities ])
+        return np.partition(_density, np.unique(_kth))[_kth]
+    _weights = np.ravel(weights)
+    if len(_weights) != _num:
+        raise ValueError('density and weights must be the same size')
+    _total = np.sum(_weights)
+    return np.array([ _weighted_select(_density, _weights, (1.-_p)*_total)
+                      for _p in _probabilities ])
+
+# ------------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def _standard_gaussian_levels( dimension, probabilities ):
+    """
+    Cached credible levels of the standard normal distribution.
+    """
+    _r2 = chi2.ppf(np.array(probabilities), dimension)
+    _levels = (2.*np.pi)**(-0.5*dimension)*np.exp(-0.5*_r2)
+    _levels.setflags(write=False)
+    return _levels
+
+# ------------------------------------------------------------------------------
+
+def gaussian_credible_levels( dimension, probabilities, cov=None ):
+    """
+    This function computes analytically the highest density contour levels
+    of a multivariate Gaussian enclosing the given probabilities. The contour
+    enclosing p is at the chi squared (with dimension degrees of freedom)
+    quantile p. Results are memoized per (dimension, probabilities).
+
+    :param dimension: number of dimensions of the Gaussian.
+    :type dimension: :class:`int`
+    :param probabilities: list of probabilities, e.g. [0.68, 0.95, 0.997].
+    :type probabilities: :class:`list`
+    :param cov: optional covariance, defaults to the identity.
+    :type cov: :class:`numpy.ndarray`
+
+    :return: array with the density levels, in the order of probabilities.
+    """
+    _levels = _standard_gaussian_levels(int(dimension), tuple( float(_p) for _p in np.atleast_1d(probabilities) ))
+    if cov is None:
+        return _levels.copy()
+    return _levels/np.sqrt(np.linalg.det(np.atleast_2d(cov)))
+
+# ******************************************************************************
+# definition of the weight diagnostics:
+
+def negligible_weight_threshold( weights, tolerance ):
+    """
+    This function returns the largest weight threshold such that all the
+    samples with weight below it carry, together, at most a fraction
+    tolerance of the total weight. Runs in linear time.
+
+    :param weights: the weights of the chain.
+    :type weights: :class:`numpy.ndarray`
+    :param tolerance: fraction of the total weight that can be neglected.
+    :type tolerance: :class:`float`
+
+    :return: the weight threshold.
+    """
+    _weights = np.asarray(weights, dtype=np.float64)
+    if tolerance <= 0.:
+        return 0.
+    return _weighted_select(_weights, _weights, tolerance*np.sum(_weights))
+
+# ------------------------------------------------------------------------------
+
+def weight_diagnostics( weights, chunk_size=2**20 ):
+    """
+    This function computes summaries of the weights of a chain in a single
+    pass over chunks of chunk_size values, so that memory does not depend on
+    the length of the chain (pass a memory mapped column, see
+    chain_utilities.load_column, for chains larger than memory).
+
+    The effective sample sizes are the Kish one, (sum w)^2/sum w^2, and the
+    entropy one, exp(H) with H = -sum p log p and p = w/sum w.
+
+    :param weights: the weights of the chain.
+    :type weights: :class:`numpy.ndarray`
+    :param chunk_size: number of weights read at a time.
+    :type chunk_size: :class:`int`
+
+    :return: dictionary with the number of samples, the number of samples
+        with non zero weight, the total weight, the largest weight, the
+        largest weight fraction, the weight entropy and the two effective
+        sample sizes.
+    """
+    _num = len(weights)
+    _nonzero = 0
+    _sum = 0.
+    _sum2 = 0.
+    _sum_wlogw = 0.
+    _max = 0.
+    for _start in range(0, _num, chunk_size):
+        _w = np.asarray(weights[_start:_start+chunk_size], dtype=np.float64)
+        if np.any(_w < 0.):
+            raise ValueError('Weights must be non negative')
+        _w = _w[_w > 0.]
+        _nonzero += len(_w)
+        _sum += np.sum(_w)
+        _sum2 += np.dot(_w, _w)
+        _sum_wlogw += np.dot(_w, np.log(_w))
+        if len(_w) > 0:
+            _max = max(_max, float(np.max(_w)))
+    if _sum <= 0.:
+        raise ValueError('Total weight must be positive')
+    _entropy = np.log(_sum)-_sum_wlogw/_sum
+    return {'num_samples': int(_num),
+            'num_nonzero': int(_nonzero),
+            'total_weight': float(_sum),
+            'max_weight': _max,
+            'max_weight_fraction': float(_max/_sum),
+            'entropy': float(_entropy),
+            'kish_ess': float(_sum**2/_sum2),
+            'entropy_ess': float(np.exp(_entropy)),
+            }
+
+# ******************************************************************************
+# definition of the nested sampling evidence utilities:
+
+def live_point_counts( logl, logl_birth ):
+    """
+    This function returns the number of live points at the death of each
+    point of a nested sampling run, from the likelihood contour each point
+    was born at (as in the PolyChord dead-birth files). A point is alive at
+    the death of point i if it was born below and dies above its likelihood.
+
+    :param logl: log-likelihood of the dead points, in increasing order.
+    :type logl: :class:`numpy.ndarray`
+    :param logl_birth: log-likelihood contour of birth of the points.
+    :type logl_birth: :class:`numpy.ndarray`
+
+    :return: integer array with the number of live points.
+    """
+    _logl = np.asarray(logl)
+    _births = np.sort(np.asarray(logl_birth))
+    # born before the death of point i, minus already dead:
+    return np.searchsorted(_births, _logl, side='left')-np.arange(len(_logl))
+
+# ------------------------------------------------------------------------------
+
+def _log_weights( log_shrinkage, log_shrinkage_complement ):
+    """
+    Returns the log prior volume of each shell, log(X_{i-1}-X_i), from the
+    log of the shrinkage ratios t_i = X_i/X_{i-1} and of 1-t_i. Works along
+    the last axis, for any number of leading (replicate) axes.
+    """
+    _log_volume = np.cumsum(log_shrinkage, axis=-1)
+    return _log_volume-log_shrinkage+log_shrinkage_complement
+
+# ------------------------------------------------------------------------------
+
+def nested_log_evidence( logl, nlive ):
+    """
+    This function computes the log-evidence of a nested sampling run from
+    its dead points, with the expected prior volume shrinkage
+    log X_i = -sum_j 1/n_j and a log-sum-exp over the shells.
+
+    :param logl: log-likelihood of the dead points, in increasing order,
+        including the final live points.
+    :type logl: :class:`numpy.ndarray`
+    :param nlive: number of live points at each death, or a single number
+        for the whole run. See :func:`live_point_counts`.
+
+    :return: float with the log-evidence.
+    """
+    _logl = np.asarray(logl, dtype=np.float64)
+    _nlive = np.broadcast_to(np.asarray(nlive, dtype=np.float64), _logl.shape)
+    _log_t = -1./_nlive
+    return logsumexp(_logl+_log_weights(_log_t, np.log(-np.expm1(_log_t))))
+
+# ------------------------------------------------------------------------------
+
+def nested_log_evidence_samples( logl, nlive, num_samples=1000, seed=None, max_elements=2**23 ):
+    """
+    This function simulates the prior volume shrinkage of a nested sampling
+    run and returns the log-evidence of each simulated run. The shrinkage
+    ratios are drawn as t_i ~ Beta(n_i, 1), i.e. log t_i = log(u)/n_i with u
+    uniform. All the replicates are computed as (replicates, points) arrays,
+    in chunks of at most max_elements values to bound the memory.
+
+    :param logl: log-likelihood of the dead points, in increasing order.
+    :type logl: :class:`numpy.ndarray`
+    :param nlive: number of live points at each death, or a single number.
+    :param num_samples: number of simulated runs.
+    :type num_samples: :class:`int`
+    :param seed: seed of the random number generator.
+    :param max_elements: maximum size of the arrays of one chunk.
+    :type max_elements: :class:`int`
+
+    :return: array with num_samples log-evidences.
+    """
+    _logl = np.asarray(logl, dtype=np.float64)
+    _inv_nlive = 1./np.broadcast_to(np.asarray(nlive, dtype=np.float64), _logl.shape)
+    _rng = np.random.default_rng(seed)
+    _chunk = max(1, int(max_elements//max(len(_logl), 1)))
+    _samples = np.empty(num_samples)
+    for _start in range(0, num_samples, _chunk):
+        _num = min(_chunk, num_samples-_start)
+        _log_t = np.log(_rng.random((_num, len(_logl))))
+        _log_t *= _inv_nlive
+        _log_w = _log_weights(_log_t, np.log(-np.expm1(_log_t)))
+        _log_w += _logl
+        _samples[_start:_start+_num] = logsumexp(_log_w, axis=1)
+    return _samples
+
+# ------------------------------------------------------------------------------
+
+def nested_evidence( logl, nlive, num_samples=1000, seed=None ):
+    """
+    This function computes the log-evidence of a nested sampling run and its
+    uncertainty, estimated as the standard deviation of the log-evidence over
+    simulated prior volume shrinkages, see :func:`nested_log_evidence_samples`.
+
+    :param logl: log-likelihood of the dead points, in increasing order.
+    :type logl: :class:`numpy.ndarray`
+    :param nlive: number of live points at each death, or a single number.
+    :param num_samples: number of simulated runs.
+    :type num_samples: :class:`int`
+    :param seed: seed of the random number generator.
+
+    :return: tuple with the log-evidence and its uncertainty.
+    """
+    _samples = nested_log_evidence_samples(logl, nlive, num_samples=num_samples, seed=seed)
+    return nested_log_evidence(logl, nlive), np.std(_samples)
+
+# ------------------------------------------------------------------------------
+
+def check_nested_evidence( nlive=500, scale=0.01, num_samples=200, seed=0 ):
+    """
+    This function checks :func:`nested_evidence` on a run with a known
+    evidence: the likelihood L(X) = exp(-X/scale) of the prior volume X,
+    sampled at the expected volumes log X_i = -i/nlive, has
+    Z = scale*(1-exp(-1/scale)).
+
+    :return: tuple with the recomputed log-evidence, its uncertainty and the
+        analytic log-evidence.
+    """
+    _log_x = -np.arange(1, 40*nlive+1)/float(nlive)
+    _logl = -np.exp(_log_x)/scale
+    _logz, _dlogz = nested_evidence(_logl, nlive, num_samples=num_samples, seed=seed)
+    return _logz, _dlogz, np.log(scale)+np.log(-np.expm1(-1./scale))
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    # numerical check of the evidence of nested sampling runs:
+    logz, dlogz, analytic = check_nested_evidence()
+    print('nested evidence: %.4f +/- %.4f, analytic %.4f' % (logz, dlogz, analytic))
+    if abs(logz-analytic) > max(dlogz, 1.e-3):
+        raise ValueError('Recomputed evidence does not match the analytic value')
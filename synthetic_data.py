@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generator of synthetic inputs for the figure scripts.
+
+Writes, in the repository layout (chains/ and data/ inside the output
+folder), MultiNest and PolyChord format chains, MultiNest stats and dead
+point files and the data/eff*.csv and data/nr*.csv evidence tables, at a
+configurable size. The chains are nested sampling runs on a correlated Gaussian, with
+the long tail of negligible early weights of real runs.
+
+Usage:
+    python synthetic_data.py [--samples N] [--params P] [--seeds S] output_folder
+"""
+
+# ******************************************************************************
+
+import os
+import numpy as np
+
+# ******************************************************************************
+# settings of the synthetic runs (as in the names of the real ones):
+
+mn_efficiencies = ['1', '03', '01', '001', '1e3']
+pc_tolerances = ['01', '001', '1e3']
+pc_repeats = [15, 30, 60, 120]
+gaussian_efficiencies = [1, 0.3, 0.1, 0.03, 0.01]
+
+# names of the first parameters, the others are p4, p5, ...:
+param_names = [('omega_m', r'\Omega_m'), ('sigma_8', r'\sigma_8'), ('w', 'w')]
+
+# ******************************************************************************
+# definition of the generators:
+
+def nested_run( num_samples, num_params, num_live=None, seed=0 ):
+    """
+    This function simulates a nested sampling run on a correlated Gaussian
+    likelihood, uniform prior, with the expected shrinkage of the prior
+    volume, log X_i = -i/num_live.
+
+    :param num_samples: number of dead points.
+    :type num_samples: :class:`int`
+    :param num_params: number of parameters.
+    :type num_params: :class:`int`
+    :param num_live: number of live points. Defaults to num_samples/40, so
+        that the run always reaches the bulk of the posterior.
+    :type num_live: :class:`int`
+    :param seed: seed of the random number generator.
+
+    :return: tuple with the (num_samples,num_params) parameters, the
+        log-likelihoods, the normalized weights and the log-likelihood
+        contours the points were born at.
+    """
+    if num_live is None:
+        num_live = max(25, num_samples//40)
+    _rng = np.random.default_rng(seed)
+    # prior radius, in units of the likelihood width:
+    _radius = 6.
+    _log_x = -np.arange(1, num_samples+1)/float(num_live)
+    # points on the iso-likelihood shells:
+    _r = _radius*np.exp(_log_x/num_params)
+    _dir = _rng.normal(size=(num_samples, num_params))
+    _dir /= np.linalg.norm(_dir, axis=1)[:, None]
+    _logl = -0.5*_r**2
+    _log_w = _logl+_log_x+np.log(np.expm1(1./num_live))
+    _weights = np.exp(_log_w-np.max(_log_w))
+    _weights /= np.sum(_weights)
+    # correlated parameters around plausible values:
+    _mean = np.concatenate([[0.3, 0.8, -1.], np.zeros(max(0, num_params-3))])[:num_params]
+    _scale = np.concatenate([[0.02, 0.03, 0.1], np.ones(max(0, num_params-3))])[:num_params]
+    _corr = 0.5**np.abs(np.subtract.outer(np.arange(num_params), np.arange(num_params)))
+    _params = _mean+_scale*np.dot(_r[:, None]*_dir, np.linalg.cholesky(_corr).T)
+    # each point was born when the point num_live deaths before it died:
+    _birth = np.concatenate([np.full(min(num_live, num_samples), -1.e30), _logl[:-num_live]])
+    return _params, _logl, _weights, _birth
+
+# ------------------------------------------------------------------------------
+
+def write_chain( file_root, params, logl, weights ):
+    """
+    This function writes a chain in the MultiNest/PolyChord text format
+    (weight, -2 log-likelihood, parameters) together with its paramnames
+    file.
+
+    :param file_root: root of the chain, the chain goes to root+'.txt'.
+    :type file_root: :class:`string`
+    """
+    np.savetxt(file_root+'.txt', np.column_stack([weights, -2.*logl, params]), fmt='%.8e')
+    with open(file_root+'.paramnames', 'w') as _file:
+        for _i in range(params.shape[1]):
+            _name, _label = param_names[_i] if _i < len(param_names) else ('p'+str(_i+1), 'p_{'+str(_i+1)+'}')
+            _file.write(_name+' '+_label+'\n')
+
+# ------------------------------------------------------------------------------
+
+def write_multinest_stats( stats_file, logz, dlogz, ins_logz, ins_dlogz ):
+    """
+    This function writes the evidence lines of a MultiNest stats.dat file.
+    """
+    with open(stats_file, 'w') as _file:
+        _file.write(' Nested Sampling Global Log-Evidence           :  %.6E  +/-  %.6E\n' % (logz, dlogz))
+        _file.write(' Nested Importance Sampling Global Log-Evidence:  %.6E  +/-  %.6E\n' % (ins_logz, ins_dlogz))
+        _file.write('\n Total Modes Found:            1\n')
+
+# ------------------------------------------------------------------------------
+
+def write_multinest_dead_points( file_root, params, logl, num_live ):
+    """
+    This function writes the dead points (root+'ev.dat': parameters,
+    log-likelihood, log prior volume, mode) and the final live points
+    (root+'phys_live.points': parameters, log-likelihood, mode) of a
+    MultiNest run, the last num_live points being the live ones.
+    """
+    _num_dead = len(logl)-num_live
+    _log_x = -np.arange(1, _num_dead+1)/float(num_live)
+    np.savetxt(file_root+'ev.dat', np.column_stack([params[:_num_dead], logl[:_num_dead],
+                                                    _log_x, np.zeros(_num_dead)]), fmt='%.8e')
+    np.savetxt(file_root+'phys_live.points', np.column_stack([params[_num_dead:], logl[_num_dead:],
+                                                              np.zeros(num_live)]), fmt='%.8e')
+
+# ------------------------------------------------------------------------------
+
+def write_polychord_stats( stats_file, logz, dlogz ):
+    """
+    This function writes the evidence section of a PolyChord .stats file.
+    """
+    with open(stats_file, 'w') as _file:
+        _file.write('Evidence estimates:\n===================\n')
+        _file.write('  - We denote this as log(Z) = mu +/- sigma.\n\n')
+        _file.write('Global evidence:\n----------------\n\n')
+        _file.write('log(Z)       = %12.5f +/- %12.5f\n' % (logz, dlogz))
+
+# ------------------------------------------------------------------------------
+
+def generate( folder, num_samples=10000, num_params=3, num_seeds=10, seed=0 ):
+    """
+    This function writes all the inputs of the figure scripts in a folder.
+
+    :param folder: output folder, chains/ and data/ are created inside it.
+    :type folder: :class:`string`
+    :param num_samples: number of samples of each chain.
+    :type num_samples: :class:`int`
+    :param num_params: number of parameters of each chain (at least 3).
+    :type num_params: :class:`int`
+    :param num_seeds: number of seeds of the evidence tables.
+    :type num_seeds: :class:`int`
+    :param seed: seed of the random number generator.
+
+    :return: list of the written files.
+    """
+    if num_params < 3:
+        raise ValueError('The figures need at least 3 parameters')
+    _rng = np.random.default_rng(seed)
+    _chains = os.path.join(folder, 'chains')
+    _data = os.path.join(folder, 'data')
+    for _f in [_chains, _data]:
+        if not os.path.exists(_f):
+            os.makedirs(_f)
+    _files = []
+    # MultiNest chains and stats:
+    for _i, _eff in enumerate(mn_efficiencies):
+        _root = os.path.join(_chains, 'mn-eff'+_eff+'-omp1_d3y1_w_')
+        _params, _logl, _weights, _ = nested_run(num_samples, num_params, seed=seed+_i)
+        write_chain(_root, _params, _logl, _weights)
+        write_multinest_stats(_root+'stats.dat', -278.+_rng.normal(), 0.17, -285.+_rng.normal(0., 0.2), 0.1)
+        write_multinest_dead_points(_root, _params, _logl, max(25, num_samples//40))
+        _files += [_root+'.txt', _root+'.paramnames', _root+'stats.dat', _root+'ev.dat', _root+'phys_live.points']
+    # PolyChord chains (tolerances):
+    for _i, _tol in enumerate(pc_tolerances):
+        _root = os.path.join(_chains, 'pc-omp1-tol'+_tol+'-ff01_d3y1_w')
+        _params, _logl, _weights, _ = nested_run(num_samples, num_params, seed=seed+10+_i)
+        write_chain(_root, _params, _logl, _weights)
+        _files += [_root+'.txt', _root+'.paramnames']
+    # evidence tables of the Gaussian likelihood runs:
+    for _eff in gaussian_efficiencies:
+        _file = os.path.join(_data, 'eff'+str(_eff)+'.csv')
+        _table = np.column_stack([_rng.normal(0., 0.7, num_seeds), np.full(num_seeds, 0.77),
+                                  _rng.normal(0., 0.3, num_seeds), np.abs(_rng.normal(0.005, 0.002, num_seeds))])
+        np.savetxt(_file, _table, delimiter=',')
+        _files.append(_file)
+    for _nr in pc_repeats:
+        _file = os.path.join(_data, 'nr'+str(_nr)+'.csv')
+        np.savetxt(_file, np.column_stack([_rng.normal(0., 0.3, num_seeds), np.full(num_seeds, 0.3)]), delimiter=',')
+        _files.append(_file)
+    return _files
+
+# ******************************************************************************
+
+if __name__ == "__main__":
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Synthetic inputs for the figure scripts.')
+    parser.add_argument('folder', help='output folder')
+    parser.add_argument('--samples', type=int, default=10000, help='samples of each chain')
+    parser.add_argument('--params', type=int, default=3, help='parameters of each chain')
+    parser.add_argument('--seeds', type=int, default=10, help='seeds of the evidence tables')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random number generator')
+    args = parser.parse_args()
+
+    files = generate(args.folder, num_samples=args.samples, num_params=args.params,
+                     num_seeds=args.seeds, seed=args.seed)
+    print('written '+str(len(files))+' files to '+args.folder)
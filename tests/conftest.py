@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test configuration: the modules of the repository are imported from its
+root folder.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the numerical utilities and of the build driver.
+
+Run from the repository folder with:
+    python -m pytest -q tests
+"""
+
+# ******************************************************************************
+
+import os
+import json
+import textwrap
+
+import numpy as np
+import pytest
+
+import cache_utilities as cache
+
+# ******************************************************************************
+# fixtures:
+
+@pytest.fixture
+def cache_root( tmp_path, monkeypatch ):
+    """
+    Points the cache of the repository to an empty temporary folder.
+    """
+    _root = str(tmp_path / '.cache')
+    monkeypatch.setattr(cache, 'cache_root', _root)
+    monkeypatch.setattr(cache, '_digest_memory', None)
+    return _root
+
+# ------------------------------------------------------------------------------
+
+probe_script = '''
+figure_inputs = ['data/probe.txt']
+figure_output = 'paper_plots/figure_probe.pdf'
+
+if __name__ == "__main__":
+    import json
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import plot_utilities as pu
+    pu.set_style()
+    out_folder = pu.output_folder()
+    fig, ax = plt.subplots()
+    ax.plot([0., 1.], [0., 1.])
+    ax.set_xlabel('$x$')
+    pu.save_figure(fig, out_folder+'figure_probe.pdf')
+    with open(out_folder+'probe.json', 'w') as _file:
+        json.dump({'usetex': matplotlib.rcParams['text.usetex'],
+                   'backend': matplotlib.get_backend().lower(),
+                   'batch': pu.batch_mode()}, _file)
+    pu.show()
+'''
+
+@pytest.fixture
+def figure_folder( tmp_path, cache_root ):
+    """
+    A folder with a plot script drawing a line from one input file.
+    """
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'probe.txt').write_text('1\n')
+    (tmp_path / 'plot_probe.py').write_text(textwrap.dedent(probe_script))
+    return str(tmp_path)
+
+# ******************************************************************************
+# cache keys:
+
+def test_file_digest_is_remembered_by_size_and_time( tmp_path, cache_root ):
+    _path = tmp_path / 'chain.txt'
+    _path.write_text('1 2 3\n')
+    _digest = cache.file_digest(str(_path))
+    _stat = os.stat(str(_path))
+    # same size and modification time, the remembered digest is returned:
+    _path.write_text('4 5 6\n')
+    os.utime(str(_path), ns=(_stat.st_atime_ns, _stat.st_mtime_ns))
+    assert cache.file_digest(str(_path)) == _digest
+    # the index is persistent:
+    cache._digest_memory = None
+    assert cache.file_digest(str(_path)) == _digest
+    # a new modification time triggers hashing:
+    os.utime(str(_path), ns=(_stat.st_atime_ns, _stat.st_mtime_ns+10**9))
+    assert cache.file_digest(str(_path)) != _digest
+
+# ------------------------------------------------------------------------------
+
+def test_files_digest_depends_on_names_content_and_extra( tmp_path, cache_root ):
+    _a, _b = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    _a.write_text('1\n')
+    _b.write_text('2\n')
+    _digest = cache.files_digest([str(_a), str(_b)])
+    assert cache.files_digest([str(_a), str(_b)]) == _digest
+    assert cache.files_digest([str(_b), str(_a)]) != _digest
+    assert cache.files_digest([str(_a), str(_b)], extra=('draft',)) != _digest
+    assert cache.files_digest([str(_a), str(tmp_path / 'c.txt')]) != cache.files_digest([str(_a)])
+    _b.write_text('3\n')
+    assert cache.files_digest([str(_a), str(_b)]) != _digest
+
+# ------------------------------------------------------------------------------
+
+def test_cached_chain_matches_text_chain( tmp_path, cache_root, monkeypatch ):
+    pytest.importorskip('getdist')
+    import getdist_utilities as gu
+    import synthetic_data as sd
+    monkeypatch.setattr(gu, '_loaded_chains', type(gu._loaded_chains)())
+    _root = str(tmp_path / 'chain')
+    _params, _logl, _weights, _ = sd.nested_run(500, 3, seed=0)
+    sd.write_chain(_root, _params, _logl, _weights)
+    _text = gu.load_chain(_root, use_cache=False)
+    _first = gu.load_chain(_root)
+    assert len(os.listdir(os.path.join(cache_root, 'chains'))) == 1
+    # read back from the binary cache:
+    gu._loaded_chains.clear()
+    _second = gu.load_chain(_root)
+    assert _second is not _first
+    for _samples in [_first, _second]:
+        assert np.array_equal(_samples.samples, _text.samples)
+        assert np.array_equal(_samples.weights, _text.weights)
+        assert np.array_equal(_samples.loglikes, _text.loglikes)
+        assert _samples.getParamNames().list() == _text.getParamNames().list()
+
+# ******************************************************************************
+# columnar chains:
+
+def test_columnar_chain_round_trip( tmp_path, cache_root ):
+    import chain_utilities as chu
+    _data = np.random.default_rng(0).normal(size=(1234, 5))
+    _chain = str(tmp_path / 'chain.txt')
+    np.savetxt(_chain, _data, fmt='%.17e', header='weight -2logL p1 p2 p3')
+    # converted in several chunks:
+    _folder = chu.convert_to_columns(_chain, chunk_rows=100)
+    assert _folder == chu.columns_folder(_chain)
+    _columns = chu.load_columns(_chain)
+    assert np.array_equal(np.column_stack(_columns), _data)
+    assert np.array_equal(chu.load_column(_chain, -1), _data[:, -1])
+    _p2, _weights = chu.load_columns(_chain, [3, 0])
+    assert np.array_equal(_p2, _data[:, 3]) and np.array_equal(_weights, _data[:, 0])
+    with pytest.raises(ValueError):
+        chu.load_column(_chain, 5)
+    # a modified chain is converted again:
+    np.savetxt(_chain, 2.*_data, fmt='%.17e')
+    assert chu.columns_folder(_chain) != _folder
+    with pytest.raises(IOError):
+        chu.load_columns(_chain, convert=False)
+    assert np.array_equal(chu.load_column(_chain, 1), 2.*_data[:, 1])
+
+# ******************************************************************************
+# build driver:
+
+def test_draft_build_renders_headless_without_latex( figure_folder ):
+    # imported in the parent before the pool forks, as build_figures.py does:
+    import plot_utilities
+    import build_figures as bf
+    _figures = bf.discover_figures(figure_folder)
+    _results = bf.build(_figures, figure_folder, max_workers=1, mode='draft')
+    assert [ _r[2] for _r in _results ] == [None]
+    _draft = os.path.join(figure_folder, 'paper_plots', 'draft')
+    assert os.path.exists(os.path.join(_draft, 'figure_probe.pdf'))
+    assert not os.path.exists(os.path.join(figure_folder, 'paper_plots', 'figure_probe.pdf'))
+    with open(os.path.join(_draft, 'probe.json')) as _file:
+        _probe = json.load(_file)
+    assert _probe == {'usetex': False, 'backend': 'agg', 'batch': True}
+    assert plot_utilities.render_mode() == 'final'
+
+# ------------------------------------------------------------------------------
+
+def test_build_skips_up_to_date_figures( figure_folder ):
+    import build_figures as bf
+    _figures = bf.discover_figures(figure_folder)
+    _figure = _figures[0]
+    assert bf.is_out_of_date(_figure, figure_folder, mode='draft')
+    assert len(bf.build(_figures, figure_folder, max_workers=1, mode='draft')) == 1
+    assert not bf.is_out_of_date(_figure, figure_folder, mode='draft')
+    assert bf.build(_figures, figure_folder, max_workers=1, mode='draft') == []
+    # the render keys depend on the mode:
+    assert bf.render_key(_figure, figure_folder, 'draft') != bf.render_key(_figure, figure_folder, 'final')
+    assert bf.is_out_of_date(_figure, figure_folder, mode='final')
+    # a modified input:
+    with open(os.path.join(figure_folder, 'data', 'probe.txt'), 'w') as _file:
+        _file.write('2\n')
+    assert bf.is_out_of_date(_figure, figure_folder, mode='draft')
+    assert len(bf.build(_figures, figure_folder, max_workers=1, mode='draft')) == 1
+    assert not bf.is_out_of_date(_figure, figure_folder, mode='draft')
+    # a modified output:
+    _output = os.path.join(figure_folder, 'paper_plots', 'draft', 'figure_probe.pdf')
+    with open(_output, 'ab') as _file:
+        _file.write(b'\n')
+    assert bf.is_out_of_date(_figure, figure_folder, mode='draft')
+    # a removed output:
+    assert len(bf.build(_figures, figure_folder, max_workers=1, mode='draft')) == 1
+    os.remove(_output)
+    assert bf.is_out_of_date(_figure, figure_folder, mode='draft')
+
+# ******************************************************************************
+# stats parsers:
+
+def test_setting_from_tag():
+    import data_utilities as du
+    assert [ du.setting_from_tag(_t) for _t in ['1', '03', '01', '001', '1e3', '120'] ] == \
+           [1., 0.3, 0.1, 0.01, 0.001, 120.]
+
+# ------------------------------------------------------------------------------
+
+def test_stats_parsers( tmp_path ):
+    import data_utilities as du
+    import synthetic_data as sd
+    _multinest = str(tmp_path / 'mn_stats.dat')
+    sd.write_multinest_stats(_multinest, -277.68, 0.17, -284.93, 0.22)
+    _parsed = du.parse_multinest_stats(_multinest)
+    assert _parsed['multinest'] == pytest.approx((-277.68, 0.17))
+    assert _parsed['multinest_ins'] == pytest.approx((-284.93, 0.22))
+    _polychord = str(tmp_path / 'pc.stats')
+    sd.write_polychord_stats(_polychord, -282.34, 0.18)
+    assert du.parse_polychord_stats(_polychord)['polychord'] == pytest.approx((-282.34, 0.18))
+    (tmp_path / 'empty.stats').write_text('no evidence here\n')
+    with pytest.raises(ValueError):
+        du.parse_polychord_stats(str(tmp_path / 'empty.stats'))
+
+# ------------------------------------------------------------------------------
+
+def test_stats_override_published( tmp_path, cache_root ):
+    import data_utilities as du
+    import synthetic_data as sd
+    # only the published values:
+    _runs = du.load_stats(folder=str(tmp_path))
+    _settings, _logz, _ = du.run_grid(_runs, 'polychord', seeds=0)
+    assert list(_settings) == [15., 30., 60., 120.]
+    assert _logz[-1] == pytest.approx(-282.34)
+    # a stats file replaces the published values of its sampler, not of the others,
+    # and runs with a longer root (tolerance runs) are not taken as seeds:
+    (tmp_path / 'chains').mkdir()
+    sd.write_multinest_stats(str(tmp_path / 'chains' / 'mn-eff03-omp1_d3y1_w_stats.dat'), -1., 0.1, -2., 0.2)
+    sd.write_multinest_stats(str(tmp_path / 'chains' / 'mn-eff03-omp1-tol001_d3y1_w_stats.dat'), -9., 0.9, -9., 0.9)
+    _runs = du.load_stats(folder=str(tmp_path))
+    _settings, _logz, _dlogz = du.run_grid(_runs, 'multinest')
+    assert list(_settings) == [0.3] and _logz.shape == (1, 1)
+    assert (_logz[0, 0], _dlogz[0, 0]) == pytest.approx((-1., 0.1))
+    assert len(du.run_grid(_runs, 'polychord')[0]) == 4
+
+# ******************************************************************************
+# profiling:
+
+def test_profiling_stops_memory_tracing( tmp_path, monkeypatch ):
+    import tracemalloc
+    import profiling_utilities as prof
+    monkeypatch.setenv('SAMPLER_PLOTS_PROFILE', str(tmp_path))
+    with prof.phase('outer'):
+        with prof.phase('inner'):
+            _data = np.ones(2**18)
+    assert tracemalloc.is_tracing()
+    _trace = prof.write_trace('probe')
+    assert not tracemalloc.is_tracing()
+    with open(_trace) as _file:
+        _events = { _e['name']: _e['args'] for _e in json.load(_file)['traceEvents'] }
+    assert _events['inner']['peak_memory'] >= _data.nbytes
+    assert _events['outer']['peak_memory'] >= _events['inner']['peak_memory']
+    # disabled: nothing is traced nor recorded
+    monkeypatch.delenv('SAMPLER_PLOTS_PROFILE')
+    with prof.phase('off'):
+        pass
+    assert not tracemalloc.is_tracing() and prof._events == []
+
+# ******************************************************************************
+# density precomputation:
+
+def test_density_batches_split_chains_by_pairs():
+    import getdist_utilities as gu
+    _batches = gu._density_batches([('a', list(range(6))), ('b', list(range(2)))], 4)
+    assert _batches == [('a', [0, 3]), ('a', [1, 4]), ('a', [2, 5]), ('b', [0, 1])]
+    # every density in exactly one batch, at least one batch per chain:
+    _batches = gu._density_batches([('a', list(range(10))), ('b', [0])], 3)
+    assert sorted( _d for _r, _b in _batches if _r == 'a' for _d in _b ) == list(range(10))
+    assert [ _b for _r, _b in _batches if _r == 'b' ] == [[0]]
+
+# ------------------------------------------------------------------------------
+
+def test_precompute_densities_in_a_pool( tmp_path, cache_root ):
+    pytest.importorskip('getdist')
+    import getdist_utilities as gu
+    import synthetic_data as sd
+    sd.generate(str(tmp_path), num_samples=2000, num_params=3, num_seeds=2)
+    _roots = [ str(tmp_path / 'chains' / ('mn-eff'+_e+'-omp1_d3y1_w_')) for _e in ['1', '1e3'] ]
+    _params = ['omega_m', 'sigma_8', 'w']
+    # 3 1D and 3 2D densities per chain:
+    assert gu.precompute_densities(_roots, _params, max_workers=3) == 12
+    assert gu.precompute_densities(_roots, _params, max_workers=3) == 0
+
+# ******************************************************************************
+# weight pruning:
+
+@pytest.mark.parametrize('method', ['drop', 'merge'])
+def test_prune_weights_bounds_the_neglected_mass( method ):
+    import chain_utilities as chu
+    _rng = np.random.default_rng(3)
+    # long tail of negligible weights, then the bulk of the posterior:
+    _weights = np.concatenate([np.exp(-np.linspace(40., 5., 5000)), _rng.uniform(0.5, 1., 1000)])
+    _weights = _rng.permutation(_weights)
+    _tolerance = 1.e-3
+    _keep, _new, _mass = chu.prune_weights(_weights, _tolerance, method)
+    assert 0. < _mass <= _tolerance
+    assert len(_keep) < len(_weights)
+    assert np.all(np.diff(_keep) > 0)
+    if method == 'drop':
+        assert np.array_equal(_new, _weights[_keep])
+        assert np.isclose(np.sum(_new), (1.-_mass)*np.sum(_weights))
+    else:
+        assert np.isclose(np.sum(_new), np.sum(_weights))
+    # the heaviest samples are always kept, with their weight:
+    _heavy = _weights >= 0.5
+    assert np.all(np.isin(np.flatnonzero(_heavy), _keep))
+    assert np.array_equal(_new[np.isin(_keep, np.flatnonzero(_heavy))], _weights[_heavy])
+
+# ------------------------------------------------------------------------------
+
+def test_prune_weights_merges_runs_in_their_heaviest_sample():
+    import chain_utilities as chu
+    _weights = np.array([1.e-9, 3.e-9, 1., 2.e-9, 1., 1.e-9])
+    _keep, _new, _mass = chu.prune_weights(_weights, 1.e-6, 'merge')
+    assert np.array_equal(_keep, [1, 2, 3, 4, 5])
+    assert np.allclose(_new, [4.e-9, 1., 2.e-9, 1., 1.e-9], rtol=1.e-12, atol=0.)
+    _keep, _new, _mass = chu.prune_weights(_weights, 0., 'drop')
+    assert np.array_equal(_keep, np.arange(6)) and _mass == 0.
+    with pytest.raises(ValueError):
+        chu.prune_weights(_weights, 1.e-6, 'thin')
+
+# ******************************************************************************
+# nested sampling evidence:
+
+def test_nested_log_evidence_matches_analytic_values():
+    import statistics_utilities as su
+    _logz, _dlogz, _analytic = su.check_nested_evidence()
+    assert abs(_logz-_analytic) < max(_dlogz, 1.e-3)
+    # constant likelihood: Z = L (1-X_N), with the expected final volume X_N:
+    _nlive = np.full(3000, 100.)
+    _nlive[-100:] = np.arange(100, 0, -1)
+    _log_xn = -np.sum(1./_nlive)
+    assert np.isclose(su.nested_log_evidence(np.full(3000, -2.), _nlive), -2.+np.log1p(-np.exp(_log_xn)))
+
+# ------------------------------------------------------------------------------
+
+def test_nested_evidence_samples_do_not_depend_on_the_chunks():
+    import statistics_utilities as su
+    _logl = -np.exp(-np.arange(1, 2001)/50.)/0.01
+    _samples = su.nested_log_evidence_samples(_logl, 50, num_samples=64, seed=4)
+    _chunked = su.nested_log_evidence_samples(_logl, 50, num_samples=64, seed=4, max_elements=5*len(_logl))
+    assert np.allclose(_samples, _chunked)
+    # the spread of the simulated runs is the usual sqrt(H/n) estimate:
+    _logz, _dlogz = su.nested_evidence(_logl, 50, num_samples=400, seed=4)
+    _log_w = _logl+su._log_weights(np.full(2000, -1./50), np.full(2000, np.log(-np.expm1(-1./50))))
+    _p = np.exp(_log_w-_logz)
+    _information = np.sum(_p*(_logl-_logz))
+    assert 0.7 < _dlogz/np.sqrt(_information/50.) < 1.3
+
+# ------------------------------------------------------------------------------
+
+def test_live_point_counts():
+    import statistics_utilities as su
+    # 3 initial live points, each death replaced until the last 3:
+    _logl = np.arange(1., 8.)
+    _birth = np.array([-np.inf]*3+[1., 2., 3., 4.])
+    assert np.array_equal(su.live_point_counts(_logl, _birth), [3, 3, 3, 3, 3, 2, 1])
+
+# ******************************************************************************
+# decimation:
+
+def test_minmax_decimate_keeps_extremes_and_ends():
+    import plot_utilities as pu
+    _rng = np.random.default_rng(1)
+    _y = _rng.normal(size=100003)
+    _y[12345], _y[54321] = 50., -50.
+    _x, _w = pu.minmax_decimate(_y, 200)
+    assert len(_x) <= 2*200+2+2
+    assert np.all(np.diff(_x) > 0)
+    assert np.array_equal(_w, _y[_x])
+    assert _x[0] == 0 and _x[-1] == len(_y)-1
+    assert 12345 in _x and 54321 in _x
+    # the min and max of every bucket are kept:
+    _size = int(np.ceil(len(_y)/200.))
+    for _start in range(0, len(_y), _size):
+        _bucket = _y[_start:_start+_size]
+        assert _start+np.argmin(_bucket) in _x and _start+np.argmax(_bucket) in _x
+    # short traces are returned whole:
+    _x, _w = pu.minmax_decimate(_y[:10], 200)
+    assert np.array_equal(_x, np.arange(10)) and np.array_equal(_w, _y[:10])
+
+# ******************************************************************************
+# credible levels:
+
+@pytest.mark.parametrize('num', [100, 5000])
+def test_weighted_select_matches_sorting( num ):
+    import statistics_utilities as su
+    _rng = np.random.default_rng(num)
+    _values = _rng.normal(size=num)
+    _weights = _rng.exponential(size=num)
+    _sort = np.argsort(_values)
+    _cumulative = np.cumsum(_weights[_sort])
+    for _fraction in [0.01, 0.32, 0.5, 0.95]:
+        _target = _fraction*_cumulative[-1]
+        _expected = _values[_sort][np.searchsorted(_cumulative, _target, side='right')]
+        assert su._weighted_select(_values, _weights, _target) == _expected
+
+# ------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('num', [100, 5000])
+def test_weighted_select_limits_and_degenerate_weights( num ):
+    import statistics_utilities as su
+    _rng = np.random.default_rng(num)
+    _values = _rng.normal(size=num)
+    _weights = _rng.exponential(size=num)
+    _total = np.sum(_weights)
+    # levels 0 and 1, and round-off above 1:
+    assert su._weighted_select(_values, _weights, 0.) == np.min(_values)
+    assert su._weighted_select(_values, _weights, -1.) == np.min(_values)
+    assert su._weighted_select(_values, _weights, _total) == np.max(_values)
+    assert su._weighted_select(_values, _weights, _total*(1.+1.e-15)) == np.max(_values)
+    # all weights zero:
+    assert su._weighted_select(_values, np.zeros(num), 0.) == np.max(_values)
+    # all values equal, one value:
+    assert su._weighted_select(np.ones(num), _weights, 0.5*_total) == 1.
+    assert su._weighted_select([3.], [0.], 0.) == 3.
+    # all the weight on one value:
+    _single = np.zeros(num)
+    _single[7] = 1.
+    assert su._weighted_select(_values, _single, 0.5) == _values[7]
+    with pytest.raises(ValueError):
+        su._weighted_select([], [], 0.)
+
+# ------------------------------------------------------------------------------
+
+def test_credible_levels():
+    import statistics_utilities as su
+    _rng = np.random.default_rng(3)
+    _density = _rng.exponential(size=20000)
+    _levels = su.credible_levels(_density, [0.68, 0.95])
+    assert np.mean(_density >= _levels[0]) == pytest.approx(0.68, abs=1.e-3)
+    assert np.mean(_density >= _levels[1]) == pytest.approx(0.95, abs=1.e-3)
+    _weights = _rng.exponential(size=20000)
+    _levels = su.credible_levels(_density, [0.68, 0.95], weights=_weights)
+    for _level, _p in zip(_levels, [0.68, 0.95]):
+        assert np.sum(_weights[_density >= _level])/np.sum(_weights) == pytest.approx(_p, abs=1.e-3)
+    with pytest.raises(ValueError):
+        su.credible_levels(_density, [1.])
+    # all the weight negligible, a tolerance of one:
+    assert su.negligible_weight_threshold(_weights, 1.) == np.max(_weights)
+
+# ******************************************************************************
+# animation:
+
+def test_dead_birth_run_live_sets( tmp_path, cache_root ):
+    import animate_multinest as am
+    import synthetic_data as sd
+    _params, _logl, _, _birth = sd.nested_run(3000, 2, seed=4)
+    _file = str(tmp_path / 'run_dead-birth.txt')
+    np.savetxt(_file, np.column_stack([_params, _logl, _birth]), fmt='%.12e')
+    _frames = list(am.dead_birth_run(_file, every=7))
+    assert len(_frames) > 0 and all( _it % 7 == 0 for _it, _ in _frames )
+    # same live points as the definition: born below and dying at or above
+    # the contour of the iteration:
+    _data = np.loadtxt(_file)
+    _order = np.argsort(_data[:, -2], kind='stable')
+    _data = _data[_order]
+    for _it, _live in _frames:
+        _mask = (_data[:, -1] < _data[_it, -2]) & (np.arange(len(_data)) >= _it)
+        _expected = _data[_mask][:, :2]
+        assert np.array_equal(_live[np.lexsort(_live.T)], _expected[np.lexsort(_expected.T)])
+
+# ******************************************************************************